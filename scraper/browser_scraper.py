@@ -4,270 +4,850 @@ Uses Playwright to handle infinite scroll and AJAX-loaded content.
 """
 
 import asyncio
+import contextlib
 import logging
-from typing import List, Dict, Any, Optional
-from urllib.parse import urljoin
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
+from urllib.parse import urljoin, urlparse
 
 import re
+import requests
+from requests.adapters import HTTPAdapter
 from playwright.async_api import async_playwright, Browser, Page, Playwright
 
 logger = logging.getLogger(__name__)
 
+# Collects every product container (plus the page-level text used for gender/category
+# detection) in one browser-side pass. Containers before sel.offset were extracted on an
+# earlier pass and are skipped, and at most sel.limit containers are read (total is the index
+# reached, where the next pass starts). Attributes are returned raw; URL normalization and
+# filtering happen in Python. With sel.url, the containers come from that URL fetched and
+# parsed in the page (no rendering), and the data-next-url of its Load More button is returned.
+EXTRACT_PRODUCTS_JS = """
+async (sel) => {
+    const text = (root, selector) => {
+        const el = root.querySelector(selector);
+        return el ? el.textContent : null;
+    };
+    const metaDesc = document.querySelector('meta[name="description"]');
+    const page = {
+        url: window.location.href,
+        title: text(document, 'title'),
+        meta_description: metaDesc ? metaDesc.getAttribute('content') : null,
+        breadcrumbs: [...document.querySelectorAll('.breadcrumb, .breadcrumbs, [class*="breadcrumb"]')]
+            .map(el => el.textContent || ''),
+        gender_text: text(document, sel.gender),
+    };
+    let root = document;
+    if (sel.url) {
+        const response = await fetch(sel.url, {credentials: 'same-origin'});
+        if (!response.ok) return null;
+        root = new DOMParser().parseFromString(await response.text(), 'text/html');
+    }
+    const containers = [...root.querySelectorAll(sel.products)];
+    const start = sel.offset || 0;
+    const end = sel.limit == null ? containers.length : Math.min(containers.length, start + sel.limit);
+    const products = containers.slice(start, end).map(c => {
+        const link = c.querySelector(sel.product_url);
+        return {
+            href: link ? link.getAttribute('href') : null,
+            title: text(c, sel.title),
+            price: text(c, sel.price),
+            sale: text(c, sel.sale),
+            description: text(c, '.product-description, .description, [class*="description"]'),
+            images: [...c.querySelectorAll(sel.image_url)]
+                .map(img => img.getAttribute('src') || img.getAttribute('data-src'))
+                .filter(Boolean),
+        };
+    }).filter(p => p.href !== null);
+    const next = root.querySelector('[data-next-url]');
+    return {page, products, total: end, next_url: next ? next.getAttribute('data-next-url') : null};
+}
+"""
+
+# Selectors used when the site config leaves one out; merged once per scrape
+DEFAULT_SELECTORS = {
+    'products': '.product-block__inner',
+    'product_url': 'a[href*="/products/"]',
+    'title': 'h1, .product-title, .title',
+    'price': '.price, .product-price',
+    'sale': '.sale-price, .price--sale, [data-sale-price], .compare-at-price',
+    'image_url': 'img',
+    'gender': '.gender, .category, .collection-title, h1',
+}
+
+# Every known Load More button variant as one compound selector, used when the button
+# has no button role. Text is not matched here: every candidate is filtered by the
+# case-insensitive LOAD_MORE_TEXT before clicking, so one pass covers all spellings.
+# Elements wrapping a button or link are excluded, since the text filter also matches
+# ancestors: a .load-more-wrapper div must not win over the button inside it.
+LOAD_MORE_SELECTOR = ', '.join(f'{selector}:not(:has(button, a, [role="button"]))' for selector in [
+    'button',
+    '[role="button"]',
+    'a',
+    '#load-more',
+    '[data-next-url]',
+    '[data-load-more]',
+    '[class*="load-more"]',
+])
+
+# Visible text of a Load More button, in the languages seen on supported sites
+LOAD_MORE_TEXT = re.compile(r'cargar\s*m[aá]s|load\s*more|show\s*more|charger\s*plus|mehr\s*laden|carica\s*altro', re.I)
+
+# Scroll an element into view and click it in one browser-side call, skipping
+# Playwright's actionability retries (overlays are removed separately)
+CLICK_JS = "(el) => { el.scrollIntoView({block: 'center'}); el.click(); }"
+
+# Collection handle in a /collections/<handle> URL
+COLLECTION_HANDLE_RE = re.compile(r'/collections/([^/?#]+)')
+
+# Image filename patterns that mark a non-product shot (see _is_desired_image)
+IMAGE_UUID_RE = re.compile(r'[a-f0-9]{32,}')
+IMAGE_NUMERIC_PREFIX_RE = re.compile(r'^\d+_')
+IMAGE_CODE_ONLY_RE = re.compile(r'^[A-Z]{2,}\d+\.jpg$')
+IMAGE_VARIANT_SUFFIX_RE = re.compile(r'_(\d+)\.jpg$')
+
+# Terms that show up in real product image filenames
+MEANINGFUL_IMAGE_TERMS = (
+    'pants', 'knit', 'zipper', 'jacket', 'shirt', 'coat', 'dress', 'skirt',
+    'jeans', 'short', 'sweater', 'top', 'boot', 'shoe', 'sneaker', 'hat',
+    'cap', 'bag', 'belt', 'wallet', 'scarf', 'jewelry', 'accessory',
+    'blue', 'red', 'black', 'white', 'green', 'dark', 'light'
+)
+
+def _keyword_pattern(terms) -> re.Pattern:
+    """Compile terms into one alternation that matches any of them as a substring."""
+    return re.compile('|'.join(re.escape(term) for term in terms))
+
+
+# Category keywords, tried in order against lower-cased product/page text
+CATEGORY_PATTERNS = (
+    ('accessory', _keyword_pattern(['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet'])),
+    ('footwear', _keyword_pattern(['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals'])),
+    ('clothing', _keyword_pattern(['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater'])),
+)
+
+# Collection path segments that pin down a category for every product on the page
+COLLECTION_CATEGORY_PATTERNS = (
+    ('accessory', _keyword_pattern(['/accessories', '/bags', '/jewelry', '/hats', '/scarves', '/belts', '/wallets'])),
+    ('footwear', _keyword_pattern(['/shoes', '/boots', '/sneakers', '/footwear', '/sandals'])),
+    ('clothing', _keyword_pattern(['/clothing', '/tops', '/bottoms', '/dresses', '/jackets'])),
+)
+
+# Whole-word gender terms for lower-cased text. Plain substring checks matched "men" inside
+# "women" or "garment" and "male" inside "female"; a letter on either side rules a match out.
+WOMEN_RE = re.compile(r"(?<![a-z])(?:women|woman|female)s?(?![a-z])")
+MEN_RE = re.compile(r"(?<![a-z])(?:men|man|male)s?(?![a-z])")
+WOMEN_META_RE = re.compile(r"\((?:woman|female)\)|(?<![a-z])woman wearing")
+MEN_META_RE = re.compile(r"\((?:man|male)\)|(?<![a-z])man wearing")
+MEN_TITLE_RE = re.compile(r"(?<![a-z])(?:men's|man's|male|for men|men only)(?![a-z])")
+WOMEN_TITLE_RE = re.compile(r"(?<![a-z])(?:women's|woman's|female|for women|women only)(?![a-z])")
+MEN_DESCRIPTION_RE = re.compile(r"(?<![a-z])(?:men's|man's|male)(?![a-z])")
+WOMEN_DESCRIPTION_RE = re.compile(r"(?<![a-z])(?:women's|woman's|female)(?![a-z])")
+COLLECTION_WOMEN_RE = re.compile(r"/(?:women|woman)s?(?![a-z])")
+COLLECTION_MEN_RE = re.compile(r"/(?:men|man)s?(?![a-z])")
+
+# Shopify's storefront JSON API pages at most 250 products per request
+PRODUCTS_JSON_PAGE_SIZE = 250
+
+# Resource types the scraper never needs: product data comes from DOM text and attributes,
+# so image URLs are read from src/data-src without downloading the images themselves.
+BLOCKED_RESOURCE_TYPES = {'image', 'stylesheet', 'font', 'media'}
+
+# Third-party trackers and analytics beacons; never needed for product data
+BLOCKED_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+    'hotjar.com', 'segment.io', 'segment.com', 'connect.facebook.net', 'clarity.ms',
+)
+
+# URL patterns for Network.setBlockedURLs, used on persistent contexts where
+# context.route would disable the HTTP cache the profile is kept for
+BLOCKED_URL_PATTERNS = [
+    f'*.{ext}*' for ext in ('png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'woff', 'woff2', 'ttf', 'otf', 'css', 'mp4', 'webm')
+] + [f'*{host}*' for host in BLOCKED_HOSTS]
+
 class BrowserScraper:
-    def __init__(self, user_agent: str = None, headless: bool = True):
+    def __init__(self, user_agent: str = None, headless: bool = True, block_resources: bool = True,
+                 user_data_dir: Optional[str] = None):
         self.user_agent = user_agent or 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         self.headless = headless
+        self.block_resources = block_resources
+        # Profile directory for a persistent context; keeps the HTTP cache and cookies between runs
+        self.user_data_dir = user_data_dir
         self.browser = None
+        self.context = None
         self.playwright = None
+        self.session = None
+        self.currencies: Dict[str, Optional[str]] = {}  # Shop currency per site root; see _shop_currency
 
     async def __aenter__(self):
+        # One pooled HTTP session for every JSON request, so connections are kept alive
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': self.user_agent})
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        if self.user_data_dir:
+            # Persistent context: static assets are served from the on-disk cache on warm runs.
+            # Every page shares it, since a profile directory backs exactly one context.
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                self.user_data_dir,
+                headless=self.headless,
+                viewport={"width": 1920, "height": 1080},
+                user_agent=self.user_agent,
+            )
+        else:
+            # The browser is launched once; each scrape gets its own isolated context
+            self.browser = await self.playwright.chromium.launch(headless=self.headless)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.context:
+            await self.context.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
+        if self.session:
+            self.session.close()
+        self.context = None
+        self.browser = None
+        self.playwright = None
+        self.session = None
 
-    async def scrape_all_products(self, url: str, selectors: Dict[str, str], max_products: int = 1000) -> List[Dict[str, Any]]:
+    async def scrape_all_products(self, url: str, selectors: Dict[str, str], max_products: int = 1000,
+                                  sink: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None) -> List[Dict[str, Any]]:
         """
         Scrape all products from a page that loads content dynamically.
 
+        The scraper must already be entered as an async context manager; the browser
+        is reused across calls.
+
         Args:
             url: Page URL to scrape
             selectors: CSS selectors for extracting product data
             max_products: Maximum number of products to collect
+            sink: Optional coroutine function awaited with each batch of new products as
+                soon as it is found; when given, products are not kept in memory
 
         Returns:
-            List of product dictionaries
+            List of product dictionaries (empty when a sink is given)
         """
-        async with self as scraper:
-            page = await self.browser.new_page()
-            await page.set_viewport_size({"width": 1920, "height": 1080})
+        products = []
+        if sink is None:
+            async def sink(batch: List[Dict[str, Any]]):
+                products.extend(batch)
 
-            # Set user agent
-            await page.set_extra_http_headers({"User-Agent": self.user_agent})
+        # Shopify collections can be read straight from products.json without rendering
+        if await self._scrape_products_json(url, max_products, sink):
+            return products
 
-            logger.info(f"Loading page: {url}")
-            await page.goto(url, wait_until="domcontentloaded", timeout=180000)  # Increased timeout for slow sites
+        page = await self._new_page()
+        try:
+            await self._scrape_page(page, url, selectors, max_products, sink)
+        finally:
+            await self._close_page(page)
+        return products
 
-            # Wait for initial content to load
-            await page.wait_for_timeout(5000)
+    async def iter_products(self, url: str, selectors: Dict[str, str],
+                            max_products: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield products from a dynamically loaded page as soon as they are found.
 
-            # Handle cookie consent dialogs that might block interactions
-            await self._handle_cookie_consent(page)
+        Scraping runs in a background task, so the caller can process one batch
+        while the next Load More round is in flight.
 
-            products = []
-            previous_count = 0
-            no_change_count = 0
-            max_no_change = 50
-            load_attempts = 0
-            successful_clicks = 0
-            max_load_attempts = 250
-            min_products_target = 1000  # Keep trying until we have at least this many or nothing more loads
+        Args:
+            url: Page URL to scrape
+            selectors: CSS selectors for extracting product data
+            max_products: Maximum number of products to collect
 
-            while len(products) < max_products and load_attempts < max_load_attempts:
-                load_attempts += 1
+        Yields:
+            Product dictionaries, in the order they were found
+        """
+        # A few batches of slack; a slow consumer then pauses the scrape instead of buffering it all
+        batches: asyncio.Queue = asyncio.Queue(maxsize=4)
 
-                logger.info(f"Attempt {load_attempts}: Looking for Load More button...")
+        async def produce():
+            try:
+                await self.scrape_all_products(url, selectors, max_products, sink=batches.put)
+            except asyncio.CancelledError:
+                # The consumer stopped early and reads no end marker; waiting for room in a
+                # full queue would never finish
+                raise
+            except Exception:
+                await batches.put(None)
+                raise
+            await batches.put(None)
+
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                for product in batch:
+                    yield product
+            await task  # Re-raise a scraping error once everything found so far was yielded
+        finally:
+            task.cancel()
+            # Wait for the scrape to wind down (and close its page) before returning. An
+            # error was re-raised above if it happened while products were still consumed.
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+
+    async def scrape_many(self, urls: List[str], selectors: Dict[str, str], max_products: int = 1000,
+                          max_concurrency: int = 4) -> List[List[Dict[str, Any]]]:
+        """
+        Scrape several dynamically loaded pages concurrently with one shared browser.
 
-                # Scroll to bottom to ensure button is visible
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-                await page.wait_for_timeout(2000)
+        Args:
+            urls: Page URLs to scrape
+            selectors: CSS selectors for extracting product data
+            max_products: Maximum number of products to collect per page
+            max_concurrency: Maximum number of pages open at the same time; kept low so
+                Chromium's renderer processes don't thrash
 
-                # Handle any cookie overlays that might have appeared
-                await self._handle_cookie_consent(page)
+        Returns:
+            List of product lists, in the same order as urls
+        """
+        semaphore = asyncio.BoundedSemaphore(max_concurrency)
 
-                # Try multiple selectors for the Load More button (Scuffers uses "Cargar más")
-                button_clicked = False
-                # First try Playwright's getByText (handles "Cargar más" reliably)
+        async def scrape_one(url: str) -> List[Dict[str, Any]]:
+            async with semaphore:
                 try:
-                    load_more = page.get_by_role('button', name=re.compile(r'cargar\s*m[aá]s|load\s*more|show\s*more', re.I))
-                    if await load_more.count() > 0:
-                        await load_more.first().scroll_into_view_if_needed()
-                        await page.wait_for_timeout(500)
-                        await load_more.first().click(timeout=10000, force=True)
-                        button_clicked = True
-                        successful_clicks += 1
-                        await page.wait_for_load_state('networkidle', timeout=20000)
-                        await page.wait_for_timeout(5000)
+                    return await self.scrape_all_products(url, selectors, max_products)
                 except Exception as e:
-                    logger.debug(f"getByRole Load more click: {e}")
-                if not button_clicked:
-                    button_selectors = [
-                        'button:has-text("Cargar más")',
-                        'button:has-text("CARGAR MÁS")',
-                        '[role="button"]:has-text("Cargar más")',
-                        'a:has-text("Cargar más")',
-                        '#load-more',
-                        'button[data-next-url]',
-                        'button:has-text("Load More")',
-                        'button:has-text("LOAD MORE")',
-                        'button:has-text("Show more")',
-                        'button:has-text("SHOW MORE")',
-                        'button:has-text("Load more")',
-                        'button.button:has-text("Cargar más")',
-                        'button.button:has-text("CARGAR MÁS")',
-                        'button[data-load-more]',
-                        '[class*="load-more"]',
-                        'button:contains("Cargar más")',
-                        'button:contains("Load More")',
-                        'button:contains("Show more")',
-                        'a:has-text("Cargar más")',
-                        'a:has-text("Load More")',
-                    ]
-                    # Log candidates
-                    clickable_elements = await page.query_selector_all('button, a, [role="button"], div[onclick], span[onclick]')
-                    load_more_candidates = []
-                    load_more_keywords = [
-                        'load', 'more', 'show', 'cargar', 'charger', 'laden', 'carica',
-                        'más', 'plus', 'altro', 'mehr'
-                    ]
-                    for elem in clickable_elements:
-                        try:
-                            text = await elem.text_content()
-                            if text and any(keyword in text.lower() for keyword in load_more_keywords):
-                                load_more_candidates.append(elem)
-                        except:
-                            pass
-                    logger.info(f"Found {len(load_more_candidates)} elements with load/more/show in text")
-                    for i, elem in enumerate(load_more_candidates[:10]):
-                        try:
-                            tag = await elem.evaluate("el => el.tagName")
-                            text = await elem.text_content()
-                            visible = await elem.is_visible()
-                            logger.info(f"  Candidate {i+1}: <{tag}> '{ (text or '').strip()}' (visible: {visible})")
-                        except Exception as e:
-                            logger.debug(f"Error checking candidate {i}: {e}")
-
-                    for selector in button_selectors:
-                        try:
-                            buttons = await page.query_selector_all(selector)
-                            for button in buttons:
-                                try:
-                                    text = await button.text_content()
-                                    text = text.strip().lower() if text else ""
-
-                                    # Prioritize "load" buttons over "show" buttons, and include Spanish
-                                    is_load_button = any(phrase in text for phrase in [
-                                        'load more', 'cargar más', 'charger plus', 'mehr laden', 'carica altro'
-                                    ])
-                                    is_show_button = 'show more' in text and not is_load_button
-
-                                    if is_load_button or is_show_button:
-                                        # First, try to scroll the button into view
-                                        try:
-                                            await button.scroll_into_view_if_needed()
-                                            await page.wait_for_timeout(1000)
-                                            logger.info("Scrolled button into view")
-                                        except Exception as e:
-                                            logger.warning(f"Failed to scroll button into view: {e}")
-
-                                        is_visible = await button.is_visible()
-                                        is_disabled = await button.get_attribute('disabled')
-                                        is_disabled = is_disabled is not None
-                                        next_url = await button.get_attribute('data-next-url')
-                                        logger.info(f"Found potential button: '{text}' (visible: {is_visible}, disabled: {is_disabled}, next-url: {next_url})")
-
-                                        if is_disabled:
-                                            logger.info("Button is disabled - no more content to load")
-                                            button_clicked = True
-                                            break
-                                        elif next_url == "" or next_url is None:
-                                            logger.info("Button has no next URL - likely no more content to load")
-
-                                        if not is_disabled:
-                                            logger.info(f"Attempt {load_attempts}: Clicking {text} button...")
-                                            await self._handle_cookie_consent(page)
-                                            click_success = False
-                                            try:
-                                                await button.click(timeout=10000, force=True)
-                                                logger.info("Used direct click (force)")
-                                                click_success = True
-                                            except Exception as e:
-                                                logger.warning(f"Direct click failed: {e}")
-                                                try:
-                                                    await button.evaluate("el => { el.scrollIntoView(); el.click(); }")
-                                                    click_success = True
-                                                except Exception as e2:
-                                                    logger.warning(f"JavaScript click failed: {e2}")
-                                                    try:
-                                                        await button.dispatch_event('click')
-                                                        click_success = True
-                                                    except Exception as e3:
-                                                        logger.error(f"All click methods failed: {e3}")
-
-                                            if click_success:
-                                                successful_clicks += 1
-                                                logger.info(f"✅ Successful click #{successful_clicks} on '{text}' button")
-                                                await page.wait_for_load_state('networkidle', timeout=20000)
-                                                await page.wait_for_timeout(8000)
-                                                button_clicked = True
-                                                break
-                                except Exception as e:
-                                    logger.debug(f"Error processing button: {e}")
-                            if button_clicked:
-                                break
-                        except Exception as e:
-                            logger.debug(f"Error with selector {selector}: {e}")
-
-                if not button_clicked:
-                    logger.info(f"Attempt {load_attempts}: No clickable Load More button found")
-                    # If no button found after first few attempts, stop trying
-                    # Allow more attempts since we want maximum coverage
-                    if load_attempts >= 15:
-                        logger.info("No Load More button found after multiple attempts, stopping")
-                        break
-
-                # Extract current products after potential button click
-                current_products = await self._extract_products_from_page(page, selectors)
-                logger.info(f"Found {len(current_products)} products after attempt {load_attempts}")
-
-                # Check if we got new products
-                if len(current_products) > previous_count:
-                    products = current_products
-                    previous_count = len(current_products)
-                    no_change_count = 0
-                    progress_msg = f"New products found! Total: {len(products)}"
-                    if len(products) >= 1300:
-                        progress_msg += " 🎯 Almost there!"
-                    elif len(products) >= 1000:
-                        progress_msg += f" (target: 1321, {1321 - len(products)} remaining)"
-                    logger.info(progress_msg)
+                    logger.error(f"Failed to scrape {url}: {e}")
+                    return []
+
+        return await asyncio.gather(*(scrape_one(url) for url in urls))
+
+    async def _scrape_products_json(self, url: str, max_products: int,
+                                    sink: Callable[[List[Dict[str, Any]]], Awaitable[None]]) -> int:
+        """
+        Read a collection from Shopify's products.json endpoint instead of the rendered page.
+
+        Args:
+            url: Collection page URL
+            max_products: Maximum number of products to collect
+            sink: Coroutine function awaited with the products of each JSON page
+
+        Returns:
+            Number of products passed to sink; 0 if the endpoint is unavailable
+        """
+        match = COLLECTION_HANDLE_RE.search(url)
+        if not match or self.session is None:
+            return 0
+        base_url = self._site_root(url)
+        json_url = f"{base_url}/collections/{match.group(1)}/products.json"
+        page_signals = self._page_signals({'url': url})
+        products_path = self._products_path(url)
+        currency = None
+
+        collected = 0
+        seen_ids = set()
+        page_number = 1
+        while collected < max_products:
+            try:
+                response = await asyncio.to_thread(
+                    self.session.get,
+                    json_url,
+                    params={'page': page_number, 'limit': PRODUCTS_JSON_PAGE_SIZE},
+                    timeout=30,
+                )
+                response.raise_for_status()
+                items = response.json().get('products')
+                if not isinstance(items, list):
+                    raise ValueError("response has no product list")
+            except Exception as e:
+                if collected == 0:
+                    logger.info(f"products.json unavailable for {url}, using the browser: {e}")
                 else:
-                    no_change_count += 1
-                    logger.info(f"No new products found (attempt {no_change_count}/{max_no_change})")
-
-                    if no_change_count >= max_no_change:
-                        if len(products) >= min_products_target:
-                            logger.info("Stopping - no more products loading after multiple attempts")
-                            break
-                        # Below target: reset and keep trying (button might appear later)
-                        logger.info(f"Only {len(products)} products so far (target min {min_products_target}); resetting and trying again")
-                        no_change_count = 0
-
-                # Safety check to avoid infinite loops
-                if len(products) >= max_products:
-                    logger.info(f"Reached maximum product limit: {max_products}")
+                    # Earlier pages already went to the sink; stop rather than re-scrape them
+                    logger.warning(f"products.json page {page_number} failed for {url}, stopping at {collected} products: {e}")
+                break
+            if not items:
+                break
+            if page_number == 1:
+                currency = await self._shop_currency(base_url)
+
+            products = []
+            for item in items:
+                try:
+                    product_data = self._build_product_from_json(item, base_url, page_signals, products_path, currency)
+                except Exception as e:
+                    logger.debug(f"Failed to parse product from products.json: {e}")
+                    continue
+                if product_data and product_data['external_id'] not in seen_ids:
+                    seen_ids.add(product_data['external_id'])
+                    products.append(product_data)
+            products = products[:max_products - collected]
+            if products:
+                await sink(products)
+                collected += len(products)
+
+            if len(items) < PRODUCTS_JSON_PAGE_SIZE:
+                break
+            page_number += 1
+
+        if collected:
+            logger.info(f"Read {collected} products from {json_url}")
+        return collected
+
+    async def _new_page(self) -> Page:
+        """Open a page in a fresh context of the shared browser, or in the persistent context."""
+        if self.context is not None:
+            page = await self.context.new_page()
+            # Routing disables the HTTP cache the profile is kept for, so block via CDP instead
+            await self._configure_network(page)
+            return page
+        if self.browser is None:
+            raise RuntimeError("BrowserScraper must be used as an async context manager (async with BrowserScraper() as scraper)")
+        context = await self.browser.new_context(
+            viewport={"width": 1920, "height": 1080},
+            user_agent=self.user_agent,
+        )
+        # Skip images, stylesheets, fonts and analytics to cut bandwidth and page-load time
+        if self.block_resources:
+            await context.route("**/*", self._route_request)
+        return await context.new_page()
+
+    async def _close_page(self, page: Page):
+        """Close a page opened by _new_page, along with its context unless it is the persistent one."""
+        if self.context is not None:
+            await page.close()
+        else:
+            await page.context.close()
+
+    async def _scrape_page(self, page: Page, url: str, selectors: Dict[str, str], max_products: int,
+                           sink: Callable[[List[Dict[str, Any]]], Awaitable[None]]) -> int:
+        """
+        Load url in page and keep clicking Load More until no new products appear.
+
+        New products are passed to sink after every attempt; returns how many were found.
+        """
+        selectors = {**DEFAULT_SELECTORS, **selectors}
+        product_selector = selectors['products']
+
+        # Return as soon as the response starts arriving; the product wait below is the real readiness signal
+        logger.info(f"Loading page: {url}")
+        await page.goto(url, wait_until="commit", timeout=30000)
+
+        # Wait for the first products to render instead of sleeping a fixed time
+        try:
+            await page.locator(product_selector).first.wait_for(state="visible", timeout=30000)
+        except Exception as e:
+            logger.warning(f"No products matched {product_selector} after page load: {e}")
+
+        # Handle cookie consent dialogs that might block interactions
+        await self._handle_cookie_consent(page)
+
+        # Capture JSON payloads fetched by Load More so new products can be read
+        # straight from the response instead of re-scraping the DOM
+        response_queue: asyncio.Queue = asyncio.Queue()
+        page.on("response", lambda response: self._queue_collection_response(response, response_queue))
+
+        collected = 0
+        # Keyed by external_id (the product handle), so a product read from both the grid
+        # and an intercepted JSON response is only emitted once
+        seen_ids = set()
+        container_count = 0  # Containers already extracted; only later ones are serialized
+        no_change_count = 0
+        max_no_change = 2  # Two attempts in a row without new products means nothing more will load
+        load_attempts = 0
+        successful_clicks = 0
+        max_load_attempts = 250
+
+        # Themes that put the next page's URL on the Load More button (data-next-url) are
+        # paged by fetching those URLs directly; clicking is only the fallback
+        next_url = await self._next_page_url(page)
+        if next_url:
+            extracted, container_count = await self._extract_products_from_page(page, selectors, 0, max_products)
+            collected += len(await self._emit_new_products(extracted, seen_ids, max_products - collected, sink))
+            while next_url and collected < max_products:
+                fetched = await self._fetch_next_page(page, selectors, next_url, max_products - collected)
+                if fetched is None:
+                    # The live grid still shows only the first page, so clicking from it would
+                    # reload pages already read and stop on "no new products". Open the page
+                    # that failed and keep clicking Load More from there instead.
+                    logger.info(f"Could not read {next_url} directly, opening it and clicking Load More from there")
+                    try:
+                        await page.goto(urljoin(page.url, next_url), wait_until="commit", timeout=30000)
+                        await page.locator(product_selector).first.wait_for(state="visible", timeout=30000)
+                    except Exception as e:
+                        logger.warning(f"Could not open {next_url}, stopping at {collected} products: {e}")
+                        return collected
+                    container_count = 0
                     break
+                extracted, following_url = fetched
+                new_products = await self._emit_new_products(extracted, seen_ids, max_products - collected, sink)
+                collected += len(new_products)
+                logger.info(f"Read {len(new_products)} new products from {next_url} (total: {collected})")
+                # A page without new products means the listing has wrapped around or ended
+                next_url = following_url if new_products else None
+            if not next_url or collected >= max_products:
+                logger.info(f"Final result: {collected} products collected by following data-next-url")
+                return collected
+
+        while collected < max_products and load_attempts < max_load_attempts:
+            load_attempts += 1
+
+            logger.debug(f"Attempt {load_attempts}: Looking for Load More button...")
+
+            # Bring the last product into view so the grid's lazy loading fires
+            # (the click below scrolls to and auto-waits for the button itself)
+            try:
+                await page.locator(product_selector).last.scroll_into_view_if_needed(timeout=5000)
+            except Exception as e:
+                logger.debug(f"Could not scroll to the last product: {e}")
 
-            logger.info(f"Final result: {len(products)} products collected after {load_attempts} load attempts, {successful_clicks} successful clicks")
-            if len(products) >= 1300:
-                logger.info("🎉 Excellent! Reached or exceeded target of 1321 products!")
-            elif len(products) >= 1000:
-                logger.info(f"✅ Good progress! Got {len(products)} products, close to the 1321 target")
+            # Handle any cookie overlays that might have appeared
+            await self._handle_cookie_consent(page)
+
+            # Container count before clicking, so we can wait for it to grow afterwards
+            count_before = await self._count_products(page, product_selector)
+
+            # Click the Load More button (Scuffers uses "Cargar más")
+            button_clicked = False
+            collection_finished = False
+            result = await self._click_load_more(page)
+            if result == 'clicked':
+                button_clicked = True
+                successful_clicks += 1
+                logger.info(f"✅ Successful click #{successful_clicks} on Load More button")
+                await self._wait_for_more_products(page, product_selector, count_before)
+            elif result == 'disabled':
+                logger.info("Button is disabled - no more content to load")
+                button_clicked = True
+                collection_finished = True
+
+            if not button_clicked:
+                logger.info(f"Attempt {load_attempts}: No clickable Load More button found")
+                if successful_clicks > 0:
+                    # The button was there and has now been removed: the last page was served
+                    logger.info("Load More button is gone - collection fully loaded")
+                    collection_finished = True
+                # If no button found after first few attempts, stop trying
+                # Allow more attempts since we want maximum coverage
+                elif load_attempts >= 15:
+                    logger.info("No Load More button found after multiple attempts, stopping")
+                    break
+                else:
+                    # Infinite-scroll grids load the next page from the scroll alone
+                    await self._wait_for_more_products(page, product_selector, count_before, timeout=5000)
+
+            # Extract current products after potential button click; prefer the
+            # intercepted JSON and only fall back to the DOM when none arrived
+            extracted = await self._drain_collection_responses(response_queue, page.url)
+            if not extracted:
+                extracted, total_containers = await self._extract_products_from_page(
+                    page, selectors, container_count, max_products - collected
+                )
+                if total_containers < container_count:
+                    # Grid was re-rendered; rescan from the start next time (seen_ids dedups)
+                    container_count = 0
+                else:
+                    container_count = total_containers
+
+            new_products = await self._emit_new_products(extracted, seen_ids, max_products - collected, sink)
+            logger.info(f"Found {len(new_products)} new products after attempt {load_attempts}")
+
+            # Check if we got new products
+            if new_products:
+                collected += len(new_products)
+                no_change_count = 0
+                progress_msg = f"New products found! Total: {collected}"
+                if collected >= 1300:
+                    progress_msg += " 🎯 Almost there!"
+                elif collected >= 1000:
+                    progress_msg += f" (target: 1321, {1321 - collected} remaining)"
+                logger.info(progress_msg)
             else:
-                logger.info(f"📊 Got {len(products)} products. Target is 1321 - may need more attempts")
-            await page.close()
-            return products[:max_products]
+                no_change_count += 1
+                logger.info(f"No new products found (attempt {no_change_count}/{max_no_change})")
+
+                if button_clicked and await self._next_page_url(page) == "":
+                    # Themes clear data-next-url once the last page is rendered
+                    logger.info("Load More button has no next page - collection fully loaded")
+                    break
+                if no_change_count >= max_no_change:
+                    logger.info("Stopping - no more products loading after multiple attempts")
+                    break
+
+            if collection_finished:
+                break
+
+            # Safety check to avoid infinite loops
+            if collected >= max_products:
+                logger.info(f"Reached maximum product limit: {max_products}")
+                break
+
+        logger.info(f"Final result: {collected} products collected after {load_attempts} load attempts, {successful_clicks} successful clicks")
+        if collected >= 1300:
+            logger.info("🎉 Excellent! Reached or exceeded target of 1321 products!")
+        elif collected >= 1000:
+            logger.info(f"✅ Good progress! Got {collected} products, close to the 1321 target")
+        else:
+            logger.info(f"📊 Got {collected} products. Target is 1321 - may need more attempts")
+        return collected
+
+    async def _emit_new_products(self, extracted: List[Dict[str, Any]], seen_ids: set, limit: int,
+                                 sink: Callable[[List[Dict[str, Any]]], Awaitable[None]]) -> List[Dict[str, Any]]:
+        """Pass up to limit products not in seen_ids to sink, recording them as seen, and return them."""
+        new_products = []
+        for product in extracted:
+            if len(new_products) >= limit:
+                break
+            external_id = product.get('external_id')
+            if external_id not in seen_ids:
+                seen_ids.add(external_id)
+                new_products.append(product)
+        if new_products:
+            await sink(new_products)
+        return new_products
+
+    async def _next_page_url(self, page: Page) -> Optional[str]:
+        """Return the data-next-url of the page's Load More button, if it has one."""
+        try:
+            return await page.evaluate(
+                "() => { const el = document.querySelector('[data-next-url]'); return el ? el.getAttribute('data-next-url') : null; }"
+            )
+        except Exception as e:
+            logger.debug(f"Could not read data-next-url: {e}")
+            return None
+
+    async def _fetch_next_page(self, page: Page, selectors: Dict[str, str], url: str,
+                               limit: Optional[int] = None) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Fetch a listing page from inside the browser and extract its products without rendering it.
 
+        Args:
+            page: Playwright page the listing was opened in (supplies cookies and origin)
+            selectors: CSS selectors for extracting product data, already merged with DEFAULT_SELECTORS
+            url: Page URL from data-next-url, absolute or relative to the current page
+            limit: Maximum number of product containers to read
+
+        Returns:
+            Tuple of (products, next page's data-next-url or None), or None if the page could
+            not be fetched or has no product containers
+        """
+        try:
+            snapshot = await page.evaluate(EXTRACT_PRODUCTS_JS, {**selectors, 'offset': 0, 'limit': limit, 'url': url})
+        except Exception as e:
+            logger.warning(f"Failed to fetch {url}: {e}")
+            return None
+        if not snapshot or not snapshot.get('total'):
+            return None
+        return self._products_from_snapshot(snapshot, page.url, 0), snapshot.get('next_url')
+
+    async def _click_load_more(self, page: Page) -> Optional[str]:
+        """
+        Find and click the Load More button.
+
+        Locators auto-wait for the button to be visible and enabled before clicking; if an
+        overlay still intercepts the click, the element is clicked from JS instead.
+
+        Returns:
+            'clicked' after a click, 'disabled' if the button is present but disabled,
+            or None if there is no Load More button on the page
+        """
+        # A real button named Load More wins; the markup match is only the fallback, since
+        # a union would resolve to whichever candidate comes first in the DOM
+        candidates = [
+            page.get_by_role('button', name=LOAD_MORE_TEXT),
+            page.locator(LOAD_MORE_SELECTOR).filter(has_text=LOAD_MORE_TEXT),
+        ]
+        for locator in candidates:
+            button = locator.first
+            try:
+                if not await button.count():
+                    continue
+                if await button.is_disabled():
+                    return 'disabled'
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Clicking Load More button: '{(await button.text_content() or '').strip()}'")
+                try:
+                    await button.click(timeout=5000)
+                except Exception as e:
+                    logger.debug(f"Locator click failed, clicking from JS: {e}")
+                    await button.evaluate(CLICK_JS)
+                return 'clicked'
+            except Exception as e:
+                logger.debug(f"Load More click failed: {e}")
+        return None
+
+    async def _count_products(self, page: Page, product_selector: str) -> int:
+        """Return the number of product containers currently in the DOM."""
+        try:
+            return await page.evaluate("(sel) => document.querySelectorAll(sel).length", product_selector)
+        except Exception as e:
+            logger.debug(f"Could not count products: {e}")
+            return 0
+
+    async def _wait_for_more_products(self, page: Page, product_selector: str, previous_count: int, timeout: int = 10000):
+        """Wait until more than previous_count product containers are in the DOM, or the timeout passes."""
+        try:
+            await page.wait_for_function(
+                "([sel, count]) => document.querySelectorAll(sel).length > count",
+                arg=[product_selector, previous_count],
+                timeout=timeout,
+            )
+        except Exception as e:
+            logger.debug(f"Product count did not grow past {previous_count} within {timeout}ms: {e}")
+
+    async def _queue_collection_response(self, response, queue: asyncio.Queue):
+        """Queue the body of JSON collection responses triggered by Load More."""
+        try:
+            if response.request.resource_type not in ('xhr', 'fetch'):
+                return
+            if '/collections/' not in response.url:
+                return
+            content_type = response.headers.get('content-type', '')
+            if not content_type.startswith('application/json'):
+                return
+            queue.put_nowait(await response.json())
+        except Exception as e:
+            logger.debug(f"Could not read collection response {response.url}: {e}")
+
+    async def _drain_collection_responses(self, queue: asyncio.Queue, page_url: str) -> List[Dict[str, Any]]:
+        """Parse every queued collection payload into product dictionaries."""
+        products = []
+        if queue.empty():
+            return products
+        base_url = self._site_root(page_url)
+        page_signals = self._page_signals({'url': page_url})
+        products_path = self._products_path(page_url)
+        currency = await self._shop_currency(base_url)
+        while not queue.empty():
+            payload = queue.get_nowait()
+            items = payload.get('products') if isinstance(payload, dict) else None
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                try:
+                    product_data = self._build_product_from_json(item, base_url, page_signals, products_path, currency)
+                    if product_data:
+                        products.append(product_data)
+                except Exception as e:
+                    logger.debug(f"Failed to parse product from collection JSON: {e}")
+        if products:
+            logger.info(f"Parsed {len(products)} products from intercepted collection responses")
+        return products
+
+    def _build_product_from_json(self, item: Dict[str, Any], base_url: str,
+                                 page_signals: Dict[str, Optional[str]], products_path: str = '/products',
+                                 currency: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build a product dictionary from a Shopify collection JSON product.
+
+        The product URL and price come out as the collection grid shows them, so a product
+        gets the same product_url (and database id) whichever source it was read from.
+
+        Args:
+            item: Product object from products.json or an intercepted collection response
+            base_url: Site root (scheme://host, no trailing slash)
+            page_signals: Page-level gender/category hints from _page_signals
+            products_path: Path the grid links products under, from _products_path
+            currency: Shop currency code appended to prices, from _shop_currency
+
+        Returns:
+            Product dictionary or None for gift cards and products without a usable image
+        """
+        handle = item.get('handle')
+        if not handle or 'giftcard' in handle or 'gift-card' in handle:
+            return None
+
+        variants = item.get('variants') or []
+        variant = variants[0] if variants else {}
+        images = []
+        for image in item.get('images') or []:
+            images.append(image.get('src') if isinstance(image, dict) else image)
+
+        raw = {
+            'href': f"{products_path}/{handle}",
+            'title': item.get('title'),
+            'price': self._json_price(variant.get('price'), currency),
+            'description': item.get('body_html'),
+            'images': [img for img in images if img],
+        }
+        if self._is_marked_down(variant.get('price'), variant.get('compare_at_price')):
+            # Shopify's price is the current (sale) price when compare_at_price is above it
+            raw['sale'], raw['price'] = raw['price'], self._json_price(variant['compare_at_price'], currency)
+        return self._build_product(raw, base_url, page_signals)
+
+    @staticmethod
+    def _json_price(amount: Any, currency: Optional[str]) -> Optional[str]:
+        """Format a JSON price amount ("45.00") like the grid's price text ("45.00 EUR")."""
+        if amount is None or amount == '':
+            return None
+        return f"{amount} {currency}" if currency else str(amount)
+
+    @staticmethod
+    def _is_marked_down(price: Any, compare_at: Any) -> bool:
+        """True if compare_at is a real previous price above price (themes leave it 0 or equal)."""
+        try:
+            return float(compare_at) > float(price)
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _products_path(page_url: str) -> str:
+        """
+        Return the path the collection grid links products under.
+
+        Shopify grids link products inside their collection (/en/collections/all/products/<handle>),
+        so JSON products get the same URLs; outside a collection this is /products.
+        """
+        path = urlparse(page_url).path
+        match = COLLECTION_HANDLE_RE.search(path)
+        return f"{path[:match.end()]}/products" if match else '/products'
+
+    async def _shop_currency(self, base_url: str) -> Optional[str]:
+        """
+        Return the shop's currency code from Shopify's /cart.js, fetched once per site.
+
+        JSON prices are bare amounts, while the rendered grid shows them with a currency;
+        None (bare amounts) if the shop doesn't say.
+        """
+        if base_url not in self.currencies:
+            currency = None
+            if self.session is not None:
+                try:
+                    response = await asyncio.to_thread(self.session.get, f"{base_url}/cart.js", timeout=10)
+                    response.raise_for_status()
+                    currency = response.json().get('currency')
+                except Exception as e:
+                    logger.debug(f"Could not read shop currency from {base_url}/cart.js: {e}")
+            if not currency:
+                logger.warning(f"Shop currency unknown for {base_url}; JSON prices are stored without one")
+            self.currencies[base_url] = currency
+        return self.currencies[base_url]
+
+    async def _route_request(self, route):
+        """Abort requests for BLOCKED_RESOURCE_TYPES and BLOCKED_HOSTS."""
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _configure_network(self, page: Page):
+        """Keep the HTTP cache on for page and, if enabled, block BLOCKED_URL_PATTERNS through CDP."""
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send("Network.enable")
+            await cdp.send("Network.setCacheDisabled", {"cacheDisabled": False})
+            if self.block_resources:
+                await cdp.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning(f"Could not configure network for page: {e}")
 
     async def _handle_cookie_consent(self, page: Page):
         """Handle cookie consent dialogs that might block interactions."""
         try:
-            logger.info("Checking for cookie consent dialogs...")
+            logger.debug("Checking for cookie consent dialogs...")
 
             # First try to accept cookies
             cookie_selectors = [
@@ -316,7 +896,7 @@ class BrowserScraper:
                                 logger.info(f"Found discount popup close button: {selector}")
                                 await button.click(timeout=2000)
                                 logger.info("Closed discount popup")
-                                await page.wait_for_timeout(500)
+                                await self._wait_until_hidden(button, 500)
                                 break
                         except:
                             continue
@@ -337,14 +917,14 @@ class BrowserScraper:
                                 try:
                                     await button.click(timeout=2000)
                                     logger.info("Accepted cookie consent via direct click")
-                                    await page.wait_for_timeout(1000)
+                                    await self._wait_until_hidden(button, 1000)
                                     return
                                 except:
                                     # Try JavaScript click
                                     try:
                                         await button.evaluate("el => el.click()")
                                         logger.info("Accepted cookie consent via JavaScript click")
-                                        await page.wait_for_timeout(1000)
+                                        await self._wait_until_hidden(button, 1000)
                                         return
                                     except:
                                         pass
@@ -355,7 +935,7 @@ class BrowserScraper:
                     continue
 
             # If accepting didn't work, try to remove/hide the overlay entirely
-            logger.info("Cookie acceptance failed, trying to remove overlay...")
+            logger.debug("Cookie acceptance failed, trying to remove overlay...")
             overlay_removal_script = """
             // Remove common overlay elements including discount popups
             const overlaySelectors = [
@@ -416,31 +996,63 @@ class BrowserScraper:
             """
 
             try:
+                # The removal is synchronous DOM work, so there is nothing to wait for afterwards
                 await page.evaluate(overlay_removal_script)
-                logger.info("Removed cookie overlay via JavaScript")
-                await page.wait_for_timeout(500)
+                logger.debug("Removed cookie overlay via JavaScript")
             except Exception as e:
                 logger.debug(f"Overlay removal failed: {e}")
 
         except Exception as e:
             logger.debug(f"Cookie consent handling failed: {e}")
 
-    async def _extract_products_from_page(self, page: Page, selectors: Dict[str, str]) -> List[Dict[str, Any]]:
-        """Extract product data from the current page state."""
-        product_selector = selectors.get('products', '.product-block__inner')
+    async def _wait_until_hidden(self, element, timeout: int):
+        """Wait until a dismissed dialog's button is hidden or detached, for at most timeout ms."""
+        try:
+            await element.wait_for_element_state("hidden", timeout=timeout)
+        except Exception as e:
+            logger.debug(f"Dialog button still visible after {timeout}ms: {e}")
 
-        # Get all product containers
-        containers = await page.query_selector_all(product_selector)
+    async def _extract_products_from_page(self, page: Page, selectors: Dict[str, str], offset: int = 0,
+                                          limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Extract product data from the current page state.
+
+        All DOM traversal happens inside the browser in a single page.evaluate call,
+        so the cost is one round-trip per extraction instead of several per product.
+
+        Args:
+            page: Playwright page object
+            selectors: CSS selectors for extracting product data, already merged with DEFAULT_SELECTORS
+            offset: Number of leading product containers to skip (already extracted)
+            limit: Maximum number of containers to read after offset; None reads them all
+
+        Returns:
+            Tuple of (products from the containers read, offset + number of containers read)
+        """
+        try:
+            snapshot = await page.evaluate(EXTRACT_PRODUCTS_JS, {**selectors, 'offset': offset, 'limit': limit})
+        except Exception as e:
+            logger.warning(f"Failed to extract products from page: {e}")
+            return [], offset
+
+        return self._products_from_snapshot(snapshot, page.url, offset), snapshot.get('total', offset)
+
+    def _products_from_snapshot(self, snapshot: Dict[str, Any], page_url: str, offset: int) -> List[Dict[str, Any]]:
+        """Build product dictionaries from an EXTRACT_PRODUCTS_JS result."""
+        page_info = snapshot.get('page') or {}
+        page_url = page_info.get('url') or page_url
+        # Relative links and image paths all resolve against the site root; compute it once
+        base_url = self._site_root(page_url)
+        page_signals = self._page_signals(page_info)
 
         products = []
-        for i, container in enumerate(containers):
+        for i, raw in enumerate(snapshot.get('products') or []):
             try:
-                product_data = await self._extract_product_from_container(container, page, selectors)
+                product_data = self._build_product(raw, base_url, page_signals)
                 if product_data:
                     products.append(product_data)
             except Exception as e:
-                logger.warning(f"Failed to extract product {i}: {e}")
-
+                logger.warning(f"Failed to extract product {offset + i}: {e}")
         return products
 
     def _is_desired_image(self, img_url: str) -> bool:
@@ -456,12 +1068,11 @@ class BrowserScraper:
 
         # Exclude images with UUIDs (long alphanumeric strings)
         # Pattern: contains 32+ character hex-like string (UUID format)
-        import re
-        if re.search(r'[a-f0-9]{32,}', filename):
+        if IMAGE_UUID_RE.search(filename):
             return False
 
         # Exclude images that start with numeric codes like "03_", "DROP_16_", etc.
-        if re.match(r'^\d+_', filename):
+        if IMAGE_NUMERIC_PREFIX_RE.match(filename):
             return False
 
         # Exclude images that start with "DROP_" or "CO" prefixes
@@ -469,21 +1080,13 @@ class BrowserScraper:
             return False
 
         # Exclude images that are just numeric codes
-        if re.match(r'^[A-Z]{2,}\d+\.jpg$', filename):
+        if IMAGE_CODE_ONLY_RE.match(filename):
             return False
 
         # Include images that have meaningful product names
-        # Should contain actual product descriptors
-        meaningful_patterns = [
-            'pants', 'knit', 'zipper', 'jacket', 'shirt', 'coat', 'dress', 'skirt',
-            'jeans', 'short', 'sweater', 'top', 'boot', 'shoe', 'sneaker', 'hat',
-            'cap', 'bag', 'belt', 'wallet', 'scarf', 'jewelry', 'accessory',
-            'blue', 'red', 'black', 'white', 'green', 'dark', 'light'
-        ]
-
         # Check if filename contains meaningful product terms
         filename_lower = filename.lower()
-        has_meaningful_name = any(pattern in filename_lower for pattern in meaningful_patterns)
+        has_meaningful_name = any(term in filename_lower for term in MEANINGFUL_IMAGE_TERMS)
 
         # Must have at least 2 meaningful parts (separated by underscores)
         parts = filename.replace('.jpg', '').split('_')
@@ -491,99 +1094,180 @@ class BrowserScraper:
 
         # Additional check: exclude images that look like secondary variants
         # If filename ends with _2, _3, etc., be more restrictive
-        if re.search(r'_\d+\.jpg$', filename) and filename.split('_')[-1].replace('.jpg', '').isdigit():
-            variant_num = int(filename.split('_')[-1].replace('.jpg', ''))
-            if variant_num > 2:  # Only allow _1 and _2
-                return False
+        variant = IMAGE_VARIANT_SUFFIX_RE.search(filename)
+        if variant and int(variant.group(1)) > 2:  # Only allow _1 and _2
+            return False
 
         return has_meaningful_name and has_multiple_parts
 
-    async def _extract_product_from_container(self, container, page: Page, selectors: Dict[str, str]) -> Optional[Dict[str, Any]]:
-        """Extract product data from a single container element."""
-        try:
-            # Extract product URL
-            link_elem = await container.query_selector(selectors.get('product_url', 'a[href*="/products/"]'))
-            if not link_elem:
-                return None
-
-            product_url = await link_elem.get_attribute('href')
-            if product_url:
-                if product_url.startswith('/'):
-                    base_url = page.url.split('/collections')[0]  # Get base URL
-                    product_url = urljoin(base_url, product_url)
-
-            product_data = {
-                'product_url': product_url,
-                'external_id': product_url.split('/')[-1] if product_url else None
-            }
-
-            # Extract title
-            title_elem = await container.query_selector(selectors.get('title', 'h1, .product-title, .title'))
-            if title_elem:
-                title_text = await title_elem.text_content()
-                if title_text:
-                    product_data['title'] = title_text.strip()
-
-            # Extract price (full text for multi-currency: "20 USD, 450 CZK, 75 PLN")
-            price_elem = await container.query_selector(selectors.get('price', '.price, .product-price'))
-            if price_elem:
-                price_text = await price_elem.text_content()
-                if price_text:
-                    product_data['price'] = price_text.strip()
-
-            # Extract sale price (same format; only set if product is on sale)
-            sale_selector = selectors.get('sale', '.sale-price, .price--sale, [data-sale-price], .compare-at-price')
-            sale_elem = await container.query_selector(sale_selector)
-            if sale_elem:
-                sale_text = (await sale_elem.text_content() or '').strip()
-                if sale_text and sale_text != product_data.get('price'):
-                    product_data['sale'] = sale_text
-
-            # Extract all image URLs from this container (each product gets its own images)
-            img_elems = await container.query_selector_all(selectors.get('image_url', 'img'))
-            product_images = []
-            base_url = page.url.split('/collections')[0] if '/collections' in page.url else page.url.rsplit('/', 1)[0]
-            for img_el in img_elems:
-                img_url = await img_el.get_attribute('src') or await img_el.get_attribute('data-src')
-                if img_url:
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    elif img_url.startswith('/'):
-                        img_url = urljoin(base_url, img_url)
-                    if self._is_desired_image(img_url) and img_url not in product_images:
-                        product_images.append(img_url)
-            if product_images:
-                product_data['image_url'] = product_images[0]
-                if len(product_images) > 1:
-                    product_data['additional_images'] = ','.join(product_images[1:])
-
-            # Extract gender and category
-            gender, category = await self._determine_category(container, page, selectors, product_url)
-            if gender:
-                product_data['gender'] = gender
-            if category:
-                product_data['category'] = category
-
-            # Skip products without suitable images
-            if 'image_url' not in product_data:
-                logger.debug(f"Skipping product {product_data.get('external_id', 'unknown')} - no suitable image found")
-                return None
-
-            return product_data
+    @staticmethod
+    def _site_root(page_url: str) -> str:
+        """Return scheme://host for page_url."""
+        parsed = urlparse(page_url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    @staticmethod
+    def _absolute_url(url: str, base_url: str) -> str:
+        """Resolve protocol-relative and root-relative URLs with plain string concatenation."""
+        if url.startswith('//'):
+            return 'https:' + url
+        if url.startswith('/'):
+            return base_url + url
+        return url
+
+    def _build_product(self, raw: Dict[str, Any], base_url: str, page_signals: Dict[str, Optional[str]]) -> Optional[Dict[str, Any]]:
+        """
+        Build a product dictionary from the raw fields returned by EXTRACT_PRODUCTS_JS.
 
-        except Exception as e:
-            logger.error(f"Error extracting product from container: {e}")
+        Args:
+            raw: Raw product fields
+            base_url: Site root (scheme://host, no trailing slash) for root-relative links
+            page_signals: Page-level gender/category hints from _page_signals
+
+        Returns:
+            Product dictionary or None if the product has no link or usable image
+        """
+        product_url = raw.get('href')
+        if not product_url:
             return None
 
-    async def _determine_category(self, container, page: Page, selectors: Dict[str, str], product_url: str) -> tuple[Optional[str], Optional[str]]:
+        product_url = self._absolute_url(product_url, base_url)
+
+        product_data = {
+            'product_url': product_url,
+            'external_id': product_url.rsplit('/', 1)[-1]
+        }
+
+        title = (raw.get('title') or '').strip()
+        if title:
+            product_data['title'] = title
+
+        # Price keeps the full text for multi-currency: "20 USD, 450 CZK, 75 PLN"
+        price = (raw.get('price') or '').strip()
+        if price:
+            product_data['price'] = price
+
+        # Sale price (same format; only set if product is on sale)
+        sale = (raw.get('sale') or '').strip()
+        if sale and sale != product_data.get('price'):
+            product_data['sale'] = sale
+
+        # Each product gets its own images from its container
+        product_images = []
+        for img_url in raw.get('images') or []:
+            if img_url:
+                img_url = self._absolute_url(img_url, base_url)
+                if self._is_desired_image(img_url) and img_url not in product_images:
+                    product_images.append(img_url)
+        if product_images:
+            product_data['image_url'] = product_images[0]
+            if len(product_images) > 1:
+                product_data['additional_images'] = ','.join(product_images[1:])
+
+        gender, category = self._determine_category(product_url, raw.get('title'), raw.get('description'), page_signals)
+        if gender:
+            product_data['gender'] = gender
+        if category:
+            product_data['category'] = category
+
+        # Skip products without suitable images
+        if 'image_url' not in product_data:
+            logger.debug(f"Skipping product {product_data.get('external_id', 'unknown')} - no suitable image found")
+            return None
+
+        return product_data
+
+    def _match_category(self, text_lower: str) -> Optional[str]:
+        """Return 'accessory', 'footwear' or 'clothing' if text_lower mentions one, else None."""
+        for category, pattern in CATEGORY_PATTERNS:
+            if pattern.search(text_lower):
+                return category
+        return None
+
+    def _match_gender(self, text_lower: str) -> Optional[str]:
+        """Return 'women' or 'men' if text_lower contains a whole-word gender term, else None."""
+        if WOMEN_RE.search(text_lower):
+            return 'women'
+        if MEN_RE.search(text_lower):
+            return 'men'
+        return None
+
+    def _page_signals(self, page_info: Dict[str, Any]) -> Dict[str, Optional[str]]:
         """
-        Determine product gender and category from page and container content.
+        Derive gender and category hints from page-level text.
+
+        The page title, meta description, breadcrumbs and gender selector text are the same
+        for every product on the page, so this runs once per extraction pass.
+
+        Args:
+            page_info: Page-level text returned by EXTRACT_PRODUCTS_JS (or just {'url': ...})
+
+        Returns:
+            Dict with 'gender'/'category' from the page text and
+            'collection_gender'/'collection_category' from the page URL path
+        """
+        gender = None
+        category_type = None
+
+        # Check page title
+        page_title = page_info.get('title')
+        if page_title is not None:
+            title_lower = page_title.lower()
+            gender = self._match_gender(title_lower)
+            category_type = self._match_category(title_lower)
+
+        # Check meta description
+        desc_content = page_info.get('meta_description')
+        if desc_content:
+            desc_lower = desc_content.lower()
+            if not gender:
+                if MEN_META_RE.search(desc_lower):
+                    gender = 'men'
+                elif WOMEN_META_RE.search(desc_lower):
+                    gender = 'women'
+            category_type = category_type or self._match_category(desc_lower)
+
+        # Check breadcrumbs and the configured gender selector text
+        texts = list(page_info.get('breadcrumbs') or [])
+        if page_info.get('gender_text') is not None:
+            texts.append(page_info['gender_text'])
+        for text in texts:
+            text_lower = text.lower()
+            gender = gender or self._match_gender(text_lower)
+            category_type = category_type or self._match_category(text_lower)
+
+        # Check collection/category context in URL
+        page_url = (page_info.get('url') or '').lower()
+        collection_gender = None
+        if COLLECTION_WOMEN_RE.search(page_url):
+            collection_gender = 'women'
+        elif COLLECTION_MEN_RE.search(page_url):
+            collection_gender = 'men'
+
+        collection_category = next(
+            (category for category, pattern in COLLECTION_CATEGORY_PATTERNS if pattern.search(page_url)), None
+        )
+
+        return {
+            'gender': gender,
+            'category': category_type,
+            'collection_gender': collection_gender,
+            'collection_category': collection_category,
+        }
+
+    def _determine_category(self, product_url: str, title_text: Optional[str], desc_text: Optional[str],
+                            page_signals: Dict[str, Optional[str]]) -> tuple[Optional[str], Optional[str]]:
+        """
+        Determine product gender and category from the product and precomputed page hints.
+
+        Product URL hints win over page-level hints, which win over the product title and
+        description; the collection URL path is the last resort.
 
         Args:
-            container: Product container element
-            page: Playwright page object
-            selectors: CSS selectors
             product_url: Product URL
+            title_text: Product title text from the container
+            desc_text: Product description text from the container
+            page_signals: Page-level hints from _page_signals
 
         Returns:
             Tuple of (gender, category) where:
@@ -591,194 +1275,45 @@ class BrowserScraper:
             - category: 'accessory', 'footwear', 'other', or None
         """
         try:
-            gender = None
-            category_type = None
-
             # Check URL for both gender and category indicators
             url_lower = product_url.lower()
+            gender = self._match_gender(url_lower)
+            category_type = self._match_category(url_lower)
 
-            # Gender detection
-            if 'women' in url_lower or 'woman' in url_lower or 'female' in url_lower:
-                gender = 'women'
-            elif 'men' in url_lower or 'man' in url_lower or 'male' in url_lower:
-                gender = 'men'
-
-            # Category detection
-            if any(term in url_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                category_type = 'accessory'
-            elif any(term in url_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                category_type = 'footwear'
-            elif any(term in url_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                category_type = 'clothing'
-
-            # Check page title
-            title_elem = await page.query_selector('title')
-            if title_elem:
-                title_text = await title_elem.text_content()
-                title_lower = title_text.lower()
-
-                # Gender detection
-                if not gender:
-                    if 'women' in title_lower or 'woman' in title_lower:
-                        gender = 'women'
-                    elif 'men' in title_lower or 'man' in title_lower:
-                        gender = 'men'
-
-                # Category detection
-                if not category_type:
-                    if any(term in title_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                        category_type = 'accessory'
-                    elif any(term in title_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                        category_type = 'footwear'
-                    elif any(term in title_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                        category_type = 'clothing'
-
-            # Check meta description
-            meta_desc = await page.query_selector('meta[name="description"]')
-            if meta_desc:
-                desc_content = await meta_desc.get_attribute('content')
-                if desc_content:
-                    desc_lower = desc_content.lower()
-
-                    # Gender detection
-                    if not gender:
-                        if '(man)' in desc_lower or '(male)' in desc_lower or 'man wearing' in desc_lower:
-                            gender = 'men'
-                        elif '(woman)' in desc_lower or '(female)' in desc_lower or 'woman wearing' in desc_lower:
-                            gender = 'women'
-
-                    # Category detection
-                    if not category_type:
-                        if any(term in desc_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                            category_type = 'accessory'
-                        elif any(term in desc_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                            category_type = 'footwear'
-                        elif any(term in desc_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                            category_type = 'clothing'
-
-            # Check breadcrumbs
-            breadcrumbs = await page.query_selector_all('.breadcrumb, .breadcrumbs, [class*="breadcrumb"]')
-            for crumb in breadcrumbs:
-                try:
-                    crumb_text = await crumb.text_content()
-                    crumb_lower = crumb_text.lower()
-
-                    # Gender detection
-                    if not gender:
-                        if 'women' in crumb_lower or 'woman' in crumb_lower or 'female' in crumb_lower:
-                            gender = 'women'
-                        elif 'men' in crumb_lower or 'man' in crumb_lower or 'male' in crumb_lower:
-                            gender = 'men'
-
-                    # Category detection
-                    if not category_type:
-                        if any(term in crumb_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                            category_type = 'accessory'
-                        elif any(term in crumb_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                            category_type = 'footwear'
-                        elif any(term in crumb_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                            category_type = 'clothing'
-                except:
-                    continue
-
-            # Check specific selectors
-            gender_selector = selectors.get('gender', '.gender, .category, .collection-title, h1')
-            gender_elem = await page.query_selector(gender_selector)
-            if gender_elem:
-                gender_text = await gender_elem.text_content()
-                gender_lower = gender_text.lower()
-
-                # Gender detection
-                if not gender:
-                    if 'women' in gender_lower or 'woman' in gender_lower or 'female' in gender_lower:
-                        gender = 'women'
-                    elif 'men' in gender_lower or 'man' in gender_lower or 'male' in gender_lower:
-                        gender = 'men'
-
-                # Category detection
-                if not category_type:
-                    if any(term in gender_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                        category_type = 'accessory'
-                    elif any(term in gender_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                        category_type = 'footwear'
-                    elif any(term in gender_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                        category_type = 'clothing'
+            gender = gender or page_signals['gender']
+            category_type = category_type or page_signals['category']
 
             # Check product title
-            title_elem = await container.query_selector(selectors.get('title', 'h1, .product-title, .title'))
-            if title_elem:
-                title_text = await title_elem.text_content()
+            if title_text is not None:
                 title_lower = title_text.lower()
-
-                # Gender detection
                 if not gender:
-                    if any(term in title_lower for term in ['men\'s', 'man\'s', 'male', 'for men', 'men only']):
+                    if MEN_TITLE_RE.search(title_lower):
                         gender = 'men'
-                    elif any(term in title_lower for term in ['women\'s', 'woman\'s', 'female', 'for women', 'women only']):
+                    elif WOMEN_TITLE_RE.search(title_lower):
                         gender = 'women'
-                    elif 'unisex' in title_lower:
-                        gender = None  # Could be either
-
-                # Category detection
-                if not category_type:
-                    if any(term in title_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                        category_type = 'accessory'
-                    elif any(term in title_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                        category_type = 'footwear'
-                    elif any(term in title_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                        category_type = 'clothing'
+                category_type = category_type or self._match_category(title_lower)
 
             # Check product description
-            desc_elem = await container.query_selector('.product-description, .description, [class*="description"]')
-            if desc_elem:
-                desc_text = await desc_elem.text_content()
+            if desc_text is not None:
                 desc_lower = desc_text.lower()
-
-                # Gender detection
                 if not gender:
-                    if any(term in desc_lower for term in ['men\'s', 'man\'s', 'male']):
+                    if MEN_DESCRIPTION_RE.search(desc_lower):
                         gender = 'men'
-                    elif any(term in desc_lower for term in ['women\'s', 'woman\'s', 'female']):
+                    elif WOMEN_DESCRIPTION_RE.search(desc_lower):
                         gender = 'women'
-                    elif 'unisex' in desc_lower:
-                        gender = None
-
-                # Category detection
-                if not category_type:
-                    if any(term in desc_lower for term in ['accessory', 'accessories', 'bag', 'bags', 'jewelry', 'hat', 'cap', 'scarf', 'belt', 'wallet']):
-                        category_type = 'accessory'
-                    elif any(term in desc_lower for term in ['shoe', 'shoes', 'boot', 'boots', 'sneaker', 'sneakers', 'footwear', 'sandal', 'sandals']):
-                        category_type = 'footwear'
-                    elif any(term in desc_lower for term in ['jacket', 'coat', 'shirt', 'top', 'dress', 'skirt', 'pants', 'trousers', 'jeans', 'short', 'sweater']):
-                        category_type = 'clothing'
-
-            # Check collection/category context in URL
-            page_url = page.url.lower()
-            if not gender:
-                if '/collections/women' in page_url or '/women' in page_url:
-                    gender = 'women'
-                elif '/collections/men' in page_url or '/men' in page_url:
-                    gender = 'men'
+                category_type = category_type or self._match_category(desc_lower)
 
-            if not category_type:
-                if any(term in page_url for term in ['/accessories', '/bags', '/jewelry', '/hats', '/scarves', '/belts', '/wallets']):
-                    category_type = 'accessory'
-                elif any(term in page_url for term in ['/shoes', '/boots', '/sneakers', '/footwear', '/sandals']):
-                    category_type = 'footwear'
-                elif any(term in page_url for term in ['/clothing', '/tops', '/bottoms', '/dresses', '/jackets']):
-                    category_type = 'clothing'
+            gender = gender or page_signals['collection_gender']
+            category_type = category_type or page_signals['collection_category']
 
             # Infer from title when still no category (e.g. on /collections/all)
             if not category_type:
-                title_elem = await container.query_selector(selectors.get('title', 'h1, .product-title, .title'))
-                if title_elem:
-                    title_text = (await title_elem.text_content() or '').strip()
-                    if title_text:
-                        try:
-                            from .category import infer_category_from_text
-                        except ImportError:
-                            from category import infer_category_from_text
-                        category_type = infer_category_from_text(title_text)
+                if title_text and title_text.strip():
+                    try:
+                        from .category import infer_category_from_text
+                    except ImportError:
+                        from category import infer_category_from_text
+                    category_type = infer_category_from_text(title_text.strip())
 
             # Determine final category (keep any detected or inferred; only use 'other' as last resort)
             final_category = category_type if category_type else 'other'
@@ -88,7 +88,7 @@ def main():
 
         # Determine sites to scrape
         if 'all' in args.sites:
-            sites_to_scrape = list(scraper.config.keys())
+            sites_to_scrape = list(scraper.config)
         else:
             sites_to_scrape = args.sites
 
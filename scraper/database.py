@@ -7,13 +7,107 @@ import os
 import re
 import logging
 import hashlib
-import json
-from typing import Dict, List, Any, Optional
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Upsert request body limit. Batches are normally sent as one request; only payloads
+# larger than this (embeddings and metadata make rows big) are split, by size not row count.
+MAX_UPSERT_BYTES = 6_000_000
+
+# Oversized payloads are split into several requests; at most this many are in flight at once
+MAX_UPSERT_WORKERS = 8
+
+# Columns of the products table; anything else is dropped before upserting
+# (e.g. the removed 'embedding' column)
+PRODUCT_COLUMNS = frozenset({
+    'id', 'source', 'product_url', 'affiliate_url', 'image_url', 'brand', 'title',
+    'description', 'category', 'gender', 'metadata', 'size', 'second_hand',
+    'image_embedding', 'info_embedding', 'country', 'tags', 'other', 'price', 'sale',
+    'additional_images',
+})
+
+# Amount + currency code in a price string: "20 USD", "139,00 EUR", "75.50 PLN", "20USD"
+PRICE_CURRENCY_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*([A-Z]{2,3})\b', re.IGNORECASE)
+
+
+@lru_cache(maxsize=100_000)
+def _product_id(source: str, product_url: str) -> str:
+    """
+    Deterministic product ID (the table's primary key) for a source and product URL.
+
+    The same product always gets the same ID, so the algorithm must not change: existing
+    rows are matched on it. Results are memoized since every sync re-sends known products.
+    """
+    return hashlib.sha256(f"{source}:{product_url}".encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=10_000)
+def _format_price_string(text: str) -> Optional[str]:
+    """
+    Normalize one price string to multi-currency text; see SupabaseDB._format_price_text.
+
+    Memoized: a catalogue has few distinct price strings, and every sync re-sends them.
+    """
+    if not text:
+        return None
+    pairs = []
+    for m in PRICE_CURRENCY_RE.finditer(text):
+        amount = m.group(1).replace(',', '.')
+        if '.' in amount and amount.endswith('.00'):
+            amount = amount[:-3]  # "139.00" -> "139" optional; keep as-is for clarity
+        currency = m.group(2).upper()
+        pairs.append(f"{amount}{currency}")
+    if pairs:
+        return ','.join(pairs)
+    # Fallback: treat as single value without currency, e.g. "139" -> keep raw for now
+    logger.debug(f"Could not parse multi-currency from: {text!r}")
+    return text
+
+
+def _normalize_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Give every row the same keys, limited to PRODUCT_COLUMNS, as PostgREST bulk upserts require.
+
+    The key set is the union of the columns the rows actually have, not every table column:
+    a column no row mentions is left untouched on existing rows instead of being nulled.
+    Rows that already have exactly that key set are passed through without copying.
+    """
+    all_keys = set()
+    for row in rows:
+        all_keys.update(row.keys())
+    all_keys &= PRODUCT_COLUMNS
+    return [row if row.keys() == all_keys else {key: row.get(key) for key in all_keys} for row in rows]
+
+
+def _json_batches(encoded_rows: List[bytes], max_bytes: int = MAX_UPSERT_BYTES) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Pack JSON-encoded rows into JSON array bodies of at most max_bytes.
+
+    A single row larger than max_bytes is still sent, alone.
+
+    Yields:
+        Tuples of (index of the first row, index after the last row, JSON array body)
+    """
+    start = 0
+    size = 2  # the enclosing brackets
+    for index, encoded in enumerate(encoded_rows):
+        if index > start and size + len(encoded) + 1 > max_bytes:
+            yield start, index, b'[' + b','.join(encoded_rows[start:index]) + b']'
+            start, size = index, 2
+        size += len(encoded) + 1
+    if start < len(encoded_rows):
+        yield start, len(encoded_rows), b'[' + b','.join(encoded_rows[start:]) + b']'
+
+
 class SupabaseREST:
     """
     Minimal Supabase PostgREST helper for upserting into 'products' table.
@@ -34,11 +128,32 @@ class SupabaseREST:
             "Authorization": f"Bearer {self.key}",
             "Content-Type": "application/json",
         })
+        # Keep TLS connections alive between requests and retry rate limits and gateway
+        # errors. Upserts (merge-duplicates) and deletes are idempotent, so POST and DELETE
+        # are retried too. After the last attempt the error response is returned as usual.
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=[429, 502, 503, 504],
+                allowed_methods=frozenset({"GET", "HEAD", "POST", "DELETE"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         logger.info("Connected to Supabase via REST API")
 
 class SupabaseDB:
     def __init__(self):
         self.rest_client = SupabaseREST()
+        # Fingerprint of the last row successfully upserted per product id. Identical rows
+        # are not sent again (scrapers re-submit the same products on every pass), while any
+        # changed field still goes through.
+        self._synced_rows: Dict[str, int] = {}
 
     def upsert_products(self, products: List[Dict[str, Any]]) -> bool:
         """
@@ -55,85 +170,107 @@ class SupabaseDB:
             return True
 
         try:
-            # Convert products to the expected format
-            formatted_products = []
-            seen_ids = set()  # Track unique IDs
-
-            for product in products:
-                formatted_product = self._format_product_for_db(product)
-                if formatted_product:
-                    # Create unique key for deduplication based on source and product_url
-                    dedup_key = f"{formatted_product.get('source')}:{formatted_product.get('product_url')}"
-                    if dedup_key not in seen_ids:
-                        seen_ids.add(dedup_key)
-                        formatted_products.append(formatted_product)
-                    else:
-                        logger.debug(f"Skipping duplicate product: {dedup_key}")
-
-            if not formatted_products:
+            products_to_upsert = self._format_unique_products(products)
+
+            if not products_to_upsert:
                 logger.warning("No valid products to upsert after formatting")
                 return False
 
-            logger.info(f"Upserting {len(formatted_products)} unique products (removed {len(products) - len(formatted_products)} duplicates)")
-
-            # Deduplicate by 'id' within this batch to avoid conflicts
-            seen: Dict[str, Dict] = {}
-            for p in formatted_products:
-                key = p.get('id')
-                if key:
-                    seen[key] = p
-
-            products_to_upsert = list(seen.values())
+            logger.info(f"Upserting {len(products_to_upsert)} unique products (removed {len(products) - len(products_to_upsert)} duplicates)")
 
-            # Only send columns that exist in the products table (avoid sending removed 'embedding')
-            allowed_columns = {
-                'id', 'source', 'product_url', 'affiliate_url', 'image_url', 'brand', 'title',
-                'description', 'category', 'gender', 'metadata', 'size', 'second_hand',
-                'image_embedding', 'info_embedding', 'country', 'tags', 'other', 'price', 'sale',
-                'additional_images',
-            }
-            # Normalize: same keys across all rows, only allowed columns
-            all_keys = set()
-            for p in products_to_upsert:
-                all_keys.update(k for k in p.keys() if k in allowed_columns)
-            normalized_products = []
-            for p in products_to_upsert:
-                normalized = {key: p.get(key) for key in all_keys}
-                normalized_products.append(normalized)
-
-            # Use direct POST with Prefer header for upsert (matching working code)
-            endpoint = f"{self.rest_client.base_url}/rest/v1/products"
-            headers = {
-                "Prefer": "resolution=merge-duplicates,return=minimal",
-            }
+            success_count = self._post_rows(_normalize_rows(products_to_upsert))
 
-            # Chunk inserts to keep requests reasonable (metadata can be large)
-            chunk_size = 100
-            success_count = 0
-            for i in range(0, len(normalized_products), chunk_size):
-                chunk = normalized_products[i:i + chunk_size]
-                try:
-                    resp = self.rest_client.session.post(
-                        endpoint,
-                        headers=headers,
-                        data=json.dumps(chunk),  # Use data=json.dumps() matching working code
-                        timeout=60
-                    )
-                    if resp.status_code not in (200, 201, 204):
-                        logger.error(f"Failed to upsert batch {i//chunk_size + 1}: {resp.status_code} {resp.text}")
-                        continue
-                    success_count += len(chunk)
-                except Exception as batch_error:
-                    logger.error(f"Failed to upsert batch {i//chunk_size + 1}: {batch_error}")
-                    continue
-
-            logger.info(f"Successfully upserted {success_count} products in batches")
+            logger.info(f"Successfully upserted {success_count} products")
             return success_count > 0
 
         except Exception as e:
             logger.error(f"Failed to upsert products: {e}")
             return False
 
+    def _format_unique_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Format products for the database, keeping the first of each (source, product_url).
+
+        The ID is derived from (source, product_url) alone, so duplicates are detected
+        from the ID before the rest of the product is formatted. PostgREST rejects an
+        upsert that touches the same row twice.
+
+        Args:
+            products: Raw product dictionaries
+
+        Returns:
+            Formatted products, one per ID, in input order
+        """
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for product in products:
+            source = product.get('source')
+            product_url = product.get('product_url')
+            if source and product_url and _product_id(source, product_url) in by_id:
+                logger.debug(f"Skipping duplicate product: {source}:{product_url}")
+                continue
+            formatted = self._format_product_for_db(product)
+            if formatted:
+                by_id[formatted['id']] = formatted
+        return list(by_id.values())
+
+    def _post_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Upsert already normalized rows, in as few requests as the body size limit allows.
+
+        Args:
+            rows: Product rows with the same keys, limited to table columns
+
+        Returns:
+            Number of rows the database accepted, counting unchanged rows already upserted
+        """
+        encoded_rows: List[bytes] = []
+        fingerprints: List[Tuple[str, int]] = []
+        for row in rows:
+            encoded = orjson.dumps(row)
+            fingerprint = hash(encoded)
+            if self._synced_rows.get(row['id']) == fingerprint:
+                continue
+            encoded_rows.append(encoded)
+            fingerprints.append((row['id'], fingerprint))
+
+        unchanged = len(rows) - len(encoded_rows)
+        if unchanged:
+            logger.info(f"Skipping {unchanged} products unchanged since their last upsert")
+        if not encoded_rows:
+            return unchanged
+
+        def send(numbered: Tuple[int, Tuple[int, int, bytes]]) -> int:
+            batch_number, (start, stop, body) = numbered
+            sent = self._post_batch(batch_number, stop - start, body)
+            if sent:
+                self._synced_rows.update(fingerprints[start:stop])
+            return sent
+
+        batches = list(enumerate(_json_batches(encoded_rows, MAX_UPSERT_BYTES), 1))
+        if len(batches) == 1:
+            return unchanged + send(batches[0])
+
+        # Batches are independent upserts, so send them concurrently over the pooled session
+        with ThreadPoolExecutor(max_workers=min(MAX_UPSERT_WORKERS, len(batches))) as pool:
+            return unchanged + sum(pool.map(send, batches))
+
+    def _post_batch(self, batch_number: int, count: int, body: bytes) -> int:
+        """POST one JSON array body of count rows; return count on success, 0 on failure."""
+        # Use direct POST with Prefer header for upsert (matching working code)
+        endpoint = f"{self.rest_client.base_url}/rest/v1/products"
+        headers = {
+            "Prefer": "resolution=merge-duplicates,return=minimal",
+        }
+        try:
+            resp = self.rest_client.session.post(endpoint, headers=headers, data=body, timeout=60)
+            if resp.status_code not in (200, 201, 204):
+                logger.error(f"Failed to upsert batch {batch_number} ({count} rows): {resp.status_code} {resp.text}")
+                return 0
+            return count
+        except Exception as batch_error:
+            logger.error(f"Failed to upsert batch {batch_number} ({count} rows): {batch_error}")
+            return 0
+
     def _format_product_for_db(self, product: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Format a product dictionary for database insertion.
@@ -155,10 +292,7 @@ class SupabaseDB:
                 logger.warning(f"Missing required fields (source, product_url, image_url, title): {product}")
                 return None
 
-            # Generate deterministic ID from source and product_url
-            # This ensures the same product always gets the same ID
-            id_string = f"{source}:{product_url}"
-            product_id = hashlib.sha256(id_string.encode('utf-8')).hexdigest()
+            product_id = _product_id(source, product_url)
 
             # Build the formatted product
             # price/sale: text, comma-separated multi-currency (e.g. "20USD,450CZK,75PLN")
@@ -196,7 +330,7 @@ class SupabaseDB:
                 if product.get('country'):
                     metadata['country'] = product['country']
                 if metadata:
-                    formatted['metadata'] = json.dumps(metadata)
+                    formatted['metadata'] = orjson.dumps(metadata).decode()
 
             # Image embedding (main product image)
             if 'image_embedding' in product and product['image_embedding'] is not None:
@@ -229,7 +363,7 @@ class SupabaseDB:
             if 'country' in product:
                 metadata['country'] = product['country']
             if metadata:
-                formatted['metadata'] = json.dumps(metadata)
+                formatted['metadata'] = orjson.dumps(metadata).decode()
 
             return formatted
 
@@ -259,23 +393,7 @@ class SupabaseDB:
                         if chunk.strip():
                             parts.append(chunk.strip())
             return ','.join(parts) if parts else None
-        text = str(price_input).strip()
-        if not text:
-            return None
-        # Match amount + currency: e.g. "20 USD", "450 CZK", "139,00 EUR", "75.50 PLN", "20USD"
-        pattern = re.compile(r'(\d+(?:[.,]\d+)?)\s*([A-Z]{2,3})\b', re.IGNORECASE)
-        pairs = []
-        for m in pattern.finditer(text):
-            amount = m.group(1).replace(',', '.')
-            if '.' in amount and amount.endswith('.00'):
-                amount = amount[:-3]  # "139.00" -> "139" optional; keep as-is for clarity
-            currency = m.group(2).upper()
-            pairs.append(f"{amount}{currency}")
-        if pairs:
-            return ','.join(pairs)
-        # Fallback: treat as single value without currency, e.g. "139" -> keep raw for now
-        logger.debug(f"Could not parse multi-currency from: {price_input!r}")
-        return text
+        return _format_price_string(str(price_input).strip())
 
     def get_product_count(self, source: Optional[str] = None) -> int:
         """
@@ -293,9 +411,13 @@ class SupabaseDB:
             if source:
                 params["source"] = f"eq.{source}"
             
-            resp = self.rest_client.session.get(url, params=params, timeout=60)
+            # Let PostgREST count and report the total in Content-Range ("*/1234")
+            # instead of downloading every id
+            resp = self.rest_client.session.head(
+                url, params=params, headers={"Prefer": "count=exact"}, timeout=30
+            )
             resp.raise_for_status()
-            return len(resp.json())
+            return int(resp.headers["Content-Range"].rsplit("/", 1)[-1])
 
         except Exception as e:
             logger.error(f"Failed to get product count: {e}")
@@ -355,7 +477,7 @@ class SupabaseDB:
 
     def upsert_products_batch(self, products: List[Dict[str, Any]]) -> bool:
         """
-        Upsert products in batch (50 at a time).
+        Upsert products in batch (one request unless the payload is very large).
         
         Args:
             products: List of product dictionaries
@@ -366,55 +488,12 @@ class SupabaseDB:
         if not products:
             return True
         
-        formatted_products = []
-        for product in products:
-            formatted = self._format_product_for_db(product)
-            if formatted:
-                formatted_products.append(formatted)
+        formatted_products = self._format_unique_products(products)
         
         if not formatted_products:
             return False
         
-        allowed_columns = {
-            'id', 'source', 'product_url', 'affiliate_url', 'image_url', 'brand', 'title',
-            'description', 'category', 'gender', 'metadata', 'size', 'second_hand',
-            'image_embedding', 'info_embedding', 'country', 'tags', 'other', 'price', 'sale',
-            'additional_images'
-        }
-        
-        all_keys = set()
-        for p in formatted_products:
-            all_keys.update(k for k in p.keys() if k in allowed_columns)
-        
-        normalized = []
-        for p in formatted_products:
-            normalized.append({key: p.get(key) for key in all_keys})
-        
-        endpoint = f"{self.rest_client.base_url}/rest/v1/products"
-        headers = {
-            "Prefer": "resolution=merge-duplicates,return=minimal",
-        }
-        
-        chunk_size = 50
-        success = True
-        
-        for i in range(0, len(normalized), chunk_size):
-            chunk = normalized[i:i + chunk_size]
-            try:
-                resp = self.rest_client.session.post(
-                    endpoint,
-                    headers=headers,
-                    data=json.dumps(chunk),
-                    timeout=60
-                )
-                if resp.status_code not in (200, 201, 204):
-                    logger.error(f"Batch upsert failed: {resp.status_code} {resp.text}")
-                    success = False
-            except Exception as e:
-                logger.error(f"Batch upsert error: {e}")
-                success = False
-        
-        return success
+        return self._post_rows(_normalize_rows(formatted_products)) == len(formatted_products)
 
     def delete_products(self, products: List[Dict[str, Any]]) -> int:
         """
@@ -438,6 +517,10 @@ class SupabaseDB:
             if not product_url or not source:
                 continue
             
+            # Forget the last upserted row, so a re-scraped identical product is inserted
+            # again. Also done when the request fails: it may have deleted the row anyway.
+            self._synced_rows.pop(_product_id(source, product_url), None)
+
             try:
                 # Delete by composite key
                 url = f"{endpoint}?source=eq.{source}&product_url=eq.{product_url}"
@@ -450,14 +533,17 @@ class SupabaseDB:
         return deleted
 
 
-# Global instance
+# Global instance, shared by all threads (its session's connection pool is thread-safe)
 _db_instance = None
+_db_lock = threading.Lock()
 
 def get_db() -> SupabaseDB:
     """Get global database instance."""
     global _db_instance
     if _db_instance is None:
-        _db_instance = SupabaseDB()
+        with _db_lock:
+            if _db_instance is None:
+                _db_instance = SupabaseDB()
     return _db_instance
 
 
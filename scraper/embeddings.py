@@ -5,7 +5,13 @@ Uses google/siglip-base-patch16-384 model (768 dimensions).
 
 import os
 import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
 from io import BytesIO
 import torch
@@ -15,13 +21,84 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "google/siglip-base-patch16-384"
+
+# Images downloaded at once; downloads dominate batch time, not the forward pass
+DOWNLOAD_WORKERS = 16
+
+# Images are shrunk to at most this many pixels per side while decoding. SigLIP squashes
+# every image to 384x384, so anything larger only slows down its bicubic resize.
+PREPROCESS_SIZE = 512
+
+
+class _EmbeddingCache:
+    """SQLite store of image embeddings keyed by model and image URL."""
+
+    def __init__(self, path: str, model_name: str):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_embeddings "
+                "(model TEXT, url TEXT, embedding BLOB, PRIMARY KEY (model, url))"
+            )
+
+    def get_many(self, urls: List[str]) -> dict:
+        """Return {url: embedding} for the urls that are cached."""
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT url, embedding FROM image_embeddings WHERE model = ? "
+                    f"AND url IN ({','.join('?' * len(chunk))})",
+                    [self.model_name, *chunk],
+                ).fetchall()
+                for url, blob in rows:
+                    found[url] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: dict):
+        """Store {url: embedding} pairs."""
+        # Converted as one (N, D) float32 array; each row's bytes are a stored blob
+        matrix = np.asarray(list(items.values()), dtype=np.float32)
+        rows = [(self.model_name, url, row.tobytes()) for url, row in zip(items, matrix)]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_embeddings (model, url, embedding) VALUES (?, ?, ?)", rows
+            )
+
+
 class SigLIPEmbeddings:
-    def __init__(self, model_name: str = "google/siglip-base-patch16-384"):
+    def __init__(self, model_name: str = DEFAULT_MODEL, load_model: bool = True,
+                 cache_path: Optional[str] = None):
         self.model_name = model_name
         self.processor = None
         self.model = None
+        self._eager_vision_model = None  # Uncompiled vision tower while the compiled one is in use
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Using device: {self.device}")
+        # Shared keep-alive session and worker pool for image downloads
+        self.http = requests.Session()
+        self.http.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        self.http.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=64))
+        self.http.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=64))
+        self.pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+        # Image embeddings from earlier runs; product image URLs are versioned, so a
+        # URL keeps pointing at the same image
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = _EmbeddingCache(cache_path, model_name)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disabled, could not open {cache_path}: {e}")
+        # Load the weights up front so the first embedding request doesn't pay for it
+        if load_model:
+            self._load_model()
 
     def _load_model(self):
         """Load the SigLIP model and processor."""
@@ -31,12 +108,41 @@ class SigLIPEmbeddings:
                 self.processor = SiglipProcessor.from_pretrained(self.model_name)
                 self.model = SiglipModel.from_pretrained(self.model_name)
                 self.model.to(self.device)
+                if self.device.type == "cuda":
+                    # Half precision halves the memory traffic and runs on Tensor Cores
+                    self.model.half()
                 self.model.eval()
+                if self.device.type == "cuda":
+                    self._compile_vision_model()
                 logger.info("SigLIP model loaded successfully")
             except Exception as e:
                 logger.error(f"Failed to load SigLIP model: {e}")
                 raise
 
+    def _compile_vision_model(self, batch_size: int = 8):
+        """
+        Compile the vision tower with torch.compile and warm it up at the default batch size.
+
+        Compiled with a dynamic batch dimension, since real batches vary (single images,
+        short last batches, failed downloads), and without CUDA graphs, which are recorded
+        per shape. Compilation happens on the first forward pass, so a dummy batch is run
+        here rather than on a real request. _image_embeds falls back to the eager model if
+        the compiled one fails, here or on any later batch.
+        """
+        eager = self.model.vision_model
+        try:
+            self.model.vision_model = torch.compile(eager, dynamic=True)
+        except Exception as e:
+            logger.warning(f"Could not compile SigLIP vision model, using eager mode: {e}")
+            return
+        self._eager_vision_model = eager
+        size = self.processor.image_processor.size
+        dummy = torch.zeros(batch_size, 3, size['height'], size['width'],
+                            device=self.device, dtype=self.model.dtype)
+        self._image_embeds(dummy)
+        if self._eager_vision_model is not None:
+            logger.info("Compiled SigLIP vision model")
+
     def get_image_embedding(self, image_url: str, max_retries: int = 3) -> Optional[List[float]]:
         """
         Generate embedding for a single image URL.
@@ -57,31 +163,15 @@ class SigLIPEmbeddings:
             return None
 
         try:
-            # Process image with text input (required for SigLIP)
-            inputs = self.processor(
-                text=[""],  # Empty text input
-                images=image,
-                return_tensors="pt"
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                
-                # Use image_embeds (768-dim for SigLIP base) - matching working code
-                if hasattr(outputs, 'image_embeds'):
-                    embedding = outputs.image_embeds.squeeze().tolist()
-                    
-                    # Verify dimensions (should be exactly 768)
-                    if len(embedding) != 768:
-                        logger.error(f"Embedding dimension mismatch: got {len(embedding)}, expected 768")
-                        return None
-                    
-                    logger.debug(f"Generated embedding for {image_url}: dimension {len(embedding)}")
-                    return embedding
-                else:
-                    logger.error(f"Could not find image_embeds in model output. Available attributes: {dir(outputs)}")
-                    return None
+            embedding = self._image_embeds(self._pixel_values([image])).squeeze().tolist()
+
+            # Verify dimensions (should be exactly 768)
+            if len(embedding) != 768:
+                logger.error(f"Embedding dimension mismatch: got {len(embedding)}, expected 768")
+                return None
+
+            logger.debug(f"Generated embedding for {image_url}: dimension {len(embedding)}")
+            return embedding
 
         except Exception as e:
             logger.error(f"Failed to generate embedding for {image_url}: {e}")
@@ -91,6 +181,8 @@ class SigLIPEmbeddings:
         """
         Generate embeddings for multiple images in batches.
 
+        Images already in the embedding cache are not downloaded or run again.
+
         Args:
             image_urls: List of image URLs
             batch_size: Number of images to process in each batch
@@ -98,22 +190,44 @@ class SigLIPEmbeddings:
         Returns:
             List of embeddings (or None for failed images)
         """
+        if not self.cache:
+            return self._embed_batches(image_urls, batch_size)
+
+        try:
+            cached = self.cache.get_many(image_urls)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            cached = {}
+
+        missing = [url for url in image_urls if url not in cached]
+        if missing:
+            logger.info(f"Embedding {len(missing)} images ({len(image_urls) - len(missing)} cached)")
+            fresh = {url: emb for url, emb in zip(missing, self._embed_batches(missing, batch_size)) if emb}
+            try:
+                self.cache.put_many(fresh)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to cache embeddings: {e}")
+            cached.update(fresh)
+
+        return [cached.get(url) for url in image_urls]
+
+    def _embed_batches(self, image_urls: List[str], batch_size: int) -> List[Optional[List[float]]]:
+        """Download and embed images batch by batch, prefetching the next batch's downloads."""
         if self.model is None:
             self._load_model()
 
         results = []
 
-        for i in range(0, len(image_urls), batch_size):
-            batch_urls = image_urls[i:i + batch_size]
-            batch_images = []
+        batches = [image_urls[i:i + batch_size] for i in range(0, len(image_urls), batch_size)]
+        downloads = [self.pool.submit(self._download_image, url) for url in batches[0]] if batches else []
 
-            # Download images for this batch
-            for url in batch_urls:
-                image = self._download_image(url)
-                if image is not None:
-                    batch_images.append(image)
-                else:
-                    batch_images.append(None)
+        for n, batch_urls in enumerate(batches):
+            # Images of this batch, downloaded concurrently (None for failed downloads)
+            batch_images = [download.result() for download in downloads]
+
+            # Start downloading the next batch while this one runs through the model
+            if n + 1 < len(batches):
+                downloads = [self.pool.submit(self._download_image, url) for url in batches[n + 1]]
 
             # Process valid images in batch
             valid_images = [img for img in batch_images if img is not None]
@@ -121,43 +235,15 @@ class SigLIPEmbeddings:
 
             if valid_images:
                 try:
-                    # For SigLIP, we need to provide both images and text inputs
-                    # Use empty text or a generic text prompt
-                    text_inputs = [""] * len(valid_images)  # Empty text for image-only embeddings
-
-                    inputs = self.processor(
-                        text=text_inputs,
-                        images=valid_images,
-                        return_tensors="pt",
-                        padding=True
-                    )
-                    inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-                    with torch.no_grad():
-                        outputs = self.model(**inputs)
-                        
-                        # Use image_embeds (768-dim for SigLIP base) - matching working code
-                        if hasattr(outputs, 'image_embeds'):
-                            batch_embeddings = outputs.image_embeds.tolist()
-                            
-                            # Verify dimensions of first embedding
-                            if batch_embeddings and len(batch_embeddings[0]) != 768:
-                                logger.error(f"Embedding dimension mismatch: got {len(batch_embeddings[0])}, expected 768")
-                                batch_embeddings = [None] * len(valid_images)
-                        else:
-                            logger.error(f"Could not find image_embeds in model output")
-                            batch_embeddings = [None] * len(valid_images)
-
-                    # Map back to original positions and verify dimensions
+                    batch_embeddings = self._image_embeds(self._pixel_values(valid_images)).cpu().numpy()
+
+                    # Verify dimensions once for the whole (N, D) batch (D should be exactly 768),
+                    # then map rows back to their original positions
                     batch_results = [None] * len(batch_urls)
-                    for idx, embedding in zip(valid_indices, batch_embeddings):
-                        if embedding is None:
-                            batch_results[idx] = None
-                        # Verify dimensions (should be exactly 768)
-                        elif len(embedding) != 768:
-                            logger.error(f"Embedding dimension mismatch: got {len(embedding)}, expected 768")
-                            batch_results[idx] = None
-                        else:
+                    if batch_embeddings.shape[-1] != 768:
+                        logger.error(f"Embedding dimension mismatch: got {batch_embeddings.shape[-1]}, expected 768")
+                    else:
+                        for idx, embedding in zip(valid_indices, batch_embeddings.tolist()):
                             batch_results[idx] = embedding
 
                     results.extend(batch_results)
@@ -173,6 +259,78 @@ class SigLIPEmbeddings:
 
         return results
 
+    def _pixel_values(self, images: List[Image.Image]) -> torch.Tensor:
+        """
+        Turn RGB images into the model's normalized pixel_values batch, on the model's device.
+
+        On CUDA only the raw uint8 pixels are copied over and resizing and normalization run
+        on the GPU, with the processor's own size, rescale factor, mean and std. Elsewhere
+        the processor does it on the CPU.
+        """
+        if self.device.type != "cuda":
+            return self._to_device(self.processor(images=images, return_tensors="pt"))['pixel_values']
+
+        config = self.processor.image_processor
+        size = (config.size['height'], config.size['width'])
+        resized = []
+        for image in images:
+            pixels = torch.from_numpy(np.array(image)).permute(2, 0, 1).unsqueeze(0)
+            pixels = pixels.pin_memory().to(self.device, non_blocking=True).float()
+            resized.append(torch.nn.functional.interpolate(pixels, size=size, mode='bicubic',
+                                                           align_corners=False, antialias=True))
+        # Bicubic overshoots; clamp back to the 0-255 range like PIL does
+        batch = torch.cat(resized).clamp_(0, 255).mul_(config.rescale_factor)
+        mean = torch.tensor(config.image_mean, device=self.device).view(1, -1, 1, 1)
+        std = torch.tensor(config.image_std, device=self.device).view(1, -1, 1, 1)
+        return ((batch - mean) / std).to(self.model.dtype)
+
+    def _image_embeds(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """
+        Run only the vision tower and return L2-normalized float32 image embeddings.
+
+        Matches SiglipModel's image_embeds output without running the text tower.
+        """
+        try:
+            with self._inference():
+                features = self.model.get_image_features(pixel_values=pixel_values)
+        except Exception as e:
+            if self._eager_vision_model is None:
+                raise
+            # Compilation runs again for new input shapes, so it can fail after the warmup
+            logger.warning(f"Compiled SigLIP vision model failed, using eager mode: {e}")
+            self.model.vision_model, self._eager_vision_model = self._eager_vision_model, None
+            with self._inference():
+                features = self.model.get_image_features(pixel_values=pixel_values)
+        if hasattr(features, 'pooler_output'):
+            features = features.pooler_output
+        return torch.nn.functional.normalize(features.float(), dim=-1)
+
+    @contextmanager
+    def _inference(self):
+        """Forward-pass context: no autograd bookkeeping, and fp16 autocast on CUDA."""
+        is_cuda = self.device.type == "cuda"
+        with torch.inference_mode(), torch.autocast(
+            device_type=self.device.type,
+            dtype=torch.float16 if is_cuda else torch.bfloat16,
+            enabled=is_cuda,
+        ):
+            yield
+
+    def _to_device(self, inputs) -> dict:
+        """Move processor outputs to the model's device, casting pixel values to its dtype."""
+        if self.device.type != "cuda":
+            return {
+                k: v.to(self.device, dtype=self.model.dtype) if v.is_floating_point() else v.to(self.device)
+                for k, v in inputs.items()
+            }
+        # Copy from pinned host memory asynchronously; the forward pass queues behind it
+        # on the same stream, so no explicit synchronization is needed
+        return {
+            k: v.pin_memory().to(self.device, dtype=self.model.dtype if v.is_floating_point() else v.dtype,
+                                 non_blocking=True)
+            for k, v in inputs.items()
+        }
+
     def _download_image(self, url: str, max_retries: int = 3) -> Optional[Image.Image]:
         """
         Download and preprocess image.
@@ -186,18 +344,24 @@ class SigLIPEmbeddings:
         """
         for attempt in range(max_retries):
             try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                response = requests.get(url, headers=headers, timeout=10)
+                response = self.http.get(url, timeout=10)
                 response.raise_for_status()
 
                 image = Image.open(BytesIO(response.content))
+                # JPEGs can be downscaled by the decoder itself (never below the requested size)
+                image.draft('RGB', (PREPROCESS_SIZE, PREPROCESS_SIZE))
 
                 # Convert to RGB if necessary
                 if image.mode != 'RGB':
                     image = image.convert('RGB')
 
+                # Cheap bilinear pre-shrink; the processor's own resize then works on a small image
+                if image.width > PREPROCESS_SIZE or image.height > PREPROCESS_SIZE:
+                    image = image.resize(
+                        (min(image.width, PREPROCESS_SIZE), min(image.height, PREPROCESS_SIZE)),
+                        Image.Resampling.BILINEAR,
+                    )
+
                 return image
 
             except Exception as e:
@@ -220,36 +384,68 @@ class SigLIPEmbeddings:
         Returns:
             List of 768 float values, or None if failed
         """
+        return self.get_text_embeddings([text], max_length)[0]
+
+    def get_text_embeddings(self, texts: List[str], max_length: int = 64,
+                            batch_size: int = 32) -> List[Optional[List[float]]]:
+        """
+        Generate text embeddings for many texts, running the text encoder on whole batches.
+
+        Texts are padded to max_length either way, so a batched embedding is the same as
+        embedding the text on its own.
+
+        Args:
+            texts: Texts to embed
+            max_length: Max token length (SigLIP uses 64 by default)
+            batch_size: Number of texts in each forward pass
+
+        Returns:
+            List of embeddings, in the same order as texts (None for empty texts or failed batches)
+        """
         if self.model is None:
             self._load_model()
-        if not (text and str(text).strip()):
-            return None
-        try:
-            inputs = self.processor(
-                text=[str(text).strip()],
-                padding="max_length",
-                max_length=max_length,
-                truncation=True,
-                return_tensors="pt",
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            # Pass only text inputs so model returns text_embeds
-            with torch.no_grad():
-                outputs = self.model.get_text_features(**inputs)
-            if hasattr(outputs, 'pooler_output'):
-                embedding = outputs.pooler_output.squeeze().tolist()
-            else:
-                embedding = outputs[0].squeeze().tolist()
-            if len(embedding) != 768:
-                logger.warning(f"Text embedding dimension {len(embedding)}, expected 768")
-            return embedding
-        except Exception as e:
-            logger.error(f"Failed to generate text embedding: {e}")
-            return None
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        pending = [(i, str(text).strip()) for i, text in enumerate(texts) if text and str(text).strip()]
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            try:
+                inputs = self.processor(
+                    text=[text for _, text in batch],
+                    padding="max_length",
+                    max_length=max_length,
+                    truncation=True,
+                    return_tensors="pt",
+                )
+                inputs = self._to_device(inputs)
+                # Pass only text inputs so model returns text_embeds
+                with self._inference():
+                    outputs = self.model.get_text_features(**inputs)
+                if hasattr(outputs, 'pooler_output'):
+                    outputs = outputs.pooler_output
+                embeddings = outputs.float().cpu().numpy()
+            except Exception as e:
+                logger.error(f"Failed to generate text embeddings for {len(batch)} texts: {e}")
+                continue
+
+            if embeddings.shape[-1] != 768:
+                logger.warning(f"Text embedding dimension {embeddings.shape[-1]}, expected 768")
+            for (i, _), embedding in zip(batch, embeddings.tolist()):
+                results[i] = embedding
+
+        return results
+
+
+@lru_cache(maxsize=1)
+def _get_instance(model_name: str) -> SigLIPEmbeddings:
+    """Return the process-wide embeddings instance, loading the model on first use."""
+    return SigLIPEmbeddings(model_name, cache_path=os.getenv('EMBEDDING_CACHE_PATH', '.embedding-cache.sqlite'))
 
 
-# Global instance for reuse
-_embeddings_instance = None
+def _default_instance() -> SigLIPEmbeddings:
+    """Return the shared instance for the model configured in EMBEDDINGS_MODEL."""
+    return _get_instance(os.getenv('EMBEDDINGS_MODEL', DEFAULT_MODEL))
 
 def get_image_embedding(image_url: str) -> Optional[List[float]]:
     """
@@ -261,12 +457,7 @@ def get_image_embedding(image_url: str) -> Optional[List[float]]:
     Returns:
         List of 768 float values or None if failed
     """
-    global _embeddings_instance
-    if _embeddings_instance is None:
-        model_name = os.getenv('EMBEDDINGS_MODEL', 'google/siglip-base-patch16-384')
-        _embeddings_instance = SigLIPEmbeddings(model_name)
-
-    return _embeddings_instance.get_image_embedding(image_url)
+    return _default_instance().get_image_embedding(image_url)
 
 
 def get_batch_embeddings(image_urls: List[str], batch_size: int = 8) -> List[Optional[List[float]]]:
@@ -280,12 +471,7 @@ def get_batch_embeddings(image_urls: List[str], batch_size: int = 8) -> List[Opt
     Returns:
         List of embeddings (or None for failed images)
     """
-    global _embeddings_instance
-    if _embeddings_instance is None:
-        model_name = os.getenv('EMBEDDINGS_MODEL', 'google/siglip-base-patch16-384')
-        _embeddings_instance = SigLIPEmbeddings(model_name)
-
-    return _embeddings_instance.get_batch_embeddings(image_urls, batch_size)
+    return _default_instance().get_batch_embeddings(image_urls, batch_size)
 
 
 def get_text_embedding(text: str) -> Optional[List[float]]:
@@ -299,11 +485,20 @@ def get_text_embedding(text: str) -> Optional[List[float]]:
     Returns:
         List of 768 float values or None if failed
     """
-    global _embeddings_instance
-    if _embeddings_instance is None:
-        model_name = os.getenv('EMBEDDINGS_MODEL', 'google/siglip-base-patch16-384')
-        _embeddings_instance = SigLIPEmbeddings(model_name)
-    return _embeddings_instance.get_text_embedding(text)
+    return _default_instance().get_text_embedding(text)
+
+
+def get_batch_text_embeddings(texts: List[str]) -> List[Optional[List[float]]]:
+    """
+    Convenience function to get text embeddings for multiple texts in batches.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        List of embeddings (or None for empty or failed texts)
+    """
+    return _default_instance().get_text_embeddings(texts)
 
 
 if __name__ == "__main__":
@@ -3,26 +3,226 @@ HTML scraper for fashion websites.
 Handles product page scraping and parsing.
 """
 
+import asyncio
 import logging
 import re
+import sqlite3
+import threading
 import time
-from typing import Dict, List, Any, Optional
-from urllib.parse import urljoin, urlparse
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Set, Tuple
+from urllib.parse import ParseResult, urlparse
 
+import orjson
 import requests
+import soupsieve
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 
+try:
+    from .category import infer_category_from_text
+except ImportError:
+    from category import infer_category_from_text
+
 logger = logging.getLogger(__name__)
 
+# Whole-word gender terms, case-insensitive so page text needn't be lower-cased first.
+# Plain substring checks matched "men" inside "women" or "garment" and "male" inside
+# "female"; a letter on either side rules a match out.
+WOMEN_RE = re.compile(r"(?<![a-z])(?:women|woman|female)s?(?![a-z])", re.IGNORECASE)
+MEN_RE = re.compile(r"(?<![a-z])(?:men|man|male)s?(?![a-z])", re.IGNORECASE)
+WOMEN_META_RE = re.compile(r"\((?:woman|female)\)|(?<![a-z])woman wearing", re.IGNORECASE)
+MEN_META_RE = re.compile(r"\((?:man|male)\)|(?<![a-z])man wearing", re.IGNORECASE)
+MEN_DESCRIPTION_RE = re.compile(r"(?<![a-z])(?:men's|man's|male)(?![a-z])", re.IGNORECASE)
+
+# First run of digits in a product handle, used as its external ID
+HANDLE_DIGITS_RE = re.compile(r'(\d+)')
+
+# Price value inside inline product JSON
+PRICE_JSON_RE = re.compile(r'"price":\s*"([^"]+)"')
+
+# Price text must contain a digit; link text around a product carries "12,95 EUR" prices
+# and standalone size words (or numbers) that are dropped from the title
+DIGIT_RE = re.compile(r'\d')
+EUR_PRICE_RE = re.compile(r'(\d+,\d+)\s*EUR')
+SIZE_TOKENS = frozenset({'XS', 'S', 'M', 'L', 'XL', 'XXL'})
+
+# Upper bound on how much of a page body is read and parsed. Product pages with inline
+# JSON blobs run to a few MB; anything past this is dropped rather than held in memory.
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+
+def _compile_selectors(*patterns: str) -> Tuple[soupsieve.SoupSieve, Tuple[soupsieve.SoupSieve, ...]]:
+    """Compile fallback selectors as one union (for a single tree walk) plus each on its own."""
+    return soupsieve.compile(', '.join(patterns)), tuple(soupsieve.compile(p) for p in patterns)
+
+
+# Product page title/price/sale fallbacks, most specific first, and the description blocks
+TITLE_SELECTORS = _compile_selectors('h1.product-title', '.product-title', 'h1', '[class*="title"]', '.title')
+PRICE_SELECTORS = _compile_selectors('.price', '[data-price]', '.product-price', '[class*="price"]', '.money')
+SALE_SELECTORS = _compile_selectors(
+    '.sale-price', '.price--sale', '[data-sale-price]',
+    '.compare-at-price', '.product-price--sale', '[class*="sale"]'
+)
+DESCRIPTION_SELECTOR = soupsieve.compile(
+    '.metafield-rich_text_field .rte, .metafield-rich_text_field p, '
+    '.metafield-rich_text_field, .product-description, .description, [data-description]'
+)
+
+# Keyword lists compiled to case-insensitive alternations, so each text is scanned once
+# without lower-casing: generic page/collection titles, filter/navigation text that sits in
+# price-like elements, and image src/alt/class hints for logos, icons and placeholders
+TITLE_SKIP_RE = re.compile(r'all products|collection|scuffers|size guide', re.IGNORECASE)
+PRICE_SKIP_RE = re.compile(
+    r'price|low to high|high to low|filter|sort|new arrivals|best sellers|on sale', re.IGNORECASE
+)
+IMAGE_SRC_SKIP_RE = re.compile(r'logo|icon|social|flag|placeholder', re.IGNORECASE)
+IMAGE_ALT_SKIP_RE = re.compile(r'logo|icon|flag|scuffers', re.IGNORECASE)
+IMAGE_CLASS_SKIP_RE = re.compile(r'logo|icon', re.IGNORECASE)
+IMAGE_EXT_RE = re.compile(r'jpe?g|png|webp', re.IGNORECASE)
+
+# Gift cards and other card products listed among regular products. A bare "card" substring
+# also threw away cardigans, so only gift cards and a standalone "card" path segment match.
+GIFT_CARD_RE = re.compile(r'gift-?card|/card(?:[/?#]|$)', re.IGNORECASE)
+
+# Charset declared in a Content-Type header; handing it to BeautifulSoup skips encoding sniffing
+CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+# The same product path is seen on category pages and again on its product page
+@lru_cache(maxsize=4096)
+def _external_id_from_path(path: str) -> Optional[str]:
+    """Return the product handle (or its first digit run) following /products/ in a URL path."""
+    # For Shopify stores, the product ID is often in the URL path
+    # e.g., /products/new-navy-raw-jacket -> new-navy-raw-jacket
+    path_parts = path.strip('/').split('/')
+
+    if 'products' in path_parts:
+        products_index = path_parts.index('products')
+        if products_index + 1 < len(path_parts):
+            product_handle = path_parts[products_index + 1]
+            # Try to extract numeric ID if present
+            match = HANDLE_DIGITS_RE.search(product_handle)
+            if match:
+                return match.group(1)
+            else:
+                return product_handle
+
+    return None
+
+
+class _PageCache:
+    """SQLite store of page bodies keyed by URL, with the validators needed to revalidate them."""
+
+    def __init__(self, path: str):
+        # One connection shared by the product-fetch threads, serialized by the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages "
+                "(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB)"
+            )
+
+    def get(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], bytes]]:
+        """Return (etag, last_modified, body) for url, or None if it isn't cached."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], zlib.decompress(row[2])
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes):
+        """Store body for url along with its validators."""
+        blob = zlib.compress(body, 1)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body) VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, blob),
+            )
+
+
+class _TokenBucket:
+    """Thread-safe token bucket: acquire() only blocks once the burst allowance is spent."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now, so concurrent callers queue behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
 class HTMLScraper:
-    def __init__(self, user_agent: str = None, delay: float = 1.0):
+    def __init__(self, user_agent: str = None, delay: float = 1.0, cache_path: Optional[str] = None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': user_agent or 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Keep enough keep-alive connections per merchant host for concurrent product
+        # fetches, and retry rate limits and server errors at the connection level:
+        # exponential backoff with jitter, capped at 32s, or the server's Retry-After
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=1.0,
+                backoff_max=32,
+                backoff_jitter=1.0,
+                respect_retry_after_header=True,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=frozenset({"GET"}),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.delay = delay
+        # Product requests average one per `delay` seconds per merchant host; time spent on
+        # the previous request counts towards the wait, and short bursts are allowed. One
+        # bucket per host, so sites scraped concurrently don't throttle each other.
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self.max_body_bytes = MAX_BODY_BYTES
+        # Pages that came with an ETag or Last-Modified are kept on disk and revalidated
+        # with a conditional GET on the next run; a 304 reuses the stored body
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = _PageCache(cache_path)
+            except sqlite3.Error as e:
+                logger.warning(f"HTTP cache disabled, could not open {cache_path}: {e}")
         logger.info(f"HTML Scraper initialized with delay: {delay}s")
 
+    def _bucket_for(self, url: str) -> Optional[_TokenBucket]:
+        """Return the rate limiter for url's host, or None when requests aren't delayed."""
+        if self.delay <= 0:
+            return None
+        host = urlparse(url).netloc
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = _TokenBucket(rate=1 / self.delay, capacity=5)
+        return bucket
+
     def scrape_category_page(self, url: str, selectors: Dict[str, str]) -> List[Dict[str, Any]]:
         """
         Scrape a category page for product listings.
@@ -37,10 +237,11 @@ class HTMLScraper:
         logger.info(f"Scraping category page: {url}")
 
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, 'lxml')
+            body, encoding = self._get_body(url, timeout=10)
+            soup = BeautifulSoup(body, 'lxml', from_encoding=encoding)
+            # Relative product and image links on this page all resolve against its origin
+            parsed_url = urlparse(url)
+            origin = f"{parsed_url.scheme}://{parsed_url.netloc}"
 
             # Method 1: Try to find product containers first
             product_containers = soup.select(selectors.get('products', '.product-item'))
@@ -48,8 +249,10 @@ class HTMLScraper:
 
             if product_containers:
                 logger.info(f"Found {len(product_containers)} product containers")
+                # Grids often repeat a product (featured rows, colour variants); skip repeats
+                seen_urls = set()
                 for container in product_containers:
-                    product_data = self._extract_product_from_listing(container, url, selectors)
+                    product_data = self._extract_product_from_listing(container, origin, selectors, seen_urls)
                     if product_data:
                         products.append(product_data)
             else:
@@ -57,23 +260,18 @@ class HTMLScraper:
                 logger.info("No product containers found, trying direct link extraction")
                 product_links = soup.select(selectors.get('product_url', "a[href*='/products/']"))
 
-                # Filter out duplicates and gift cards
-                seen_urls = set()
-                unique_links = []
+                # Filter out gift cards and duplicates, keeping the first link for each href
+                links_by_href = {}
                 for link in product_links:
                     href = link.get('href')
-                    if href and '/products/' in href:
-                        # Skip gift cards and other non-product items
-                        if any(skip in href.lower() for skip in ['giftcard', 'gift-card', 'card']):
-                            continue
-                        if href not in seen_urls:
-                            seen_urls.add(href)
-                            unique_links.append(link)
+                    if href and '/products/' in href and href not in links_by_href and not GIFT_CARD_RE.search(href):
+                        links_by_href[href] = link
+                unique_links = list(links_by_href.values())
 
                 logger.info(f"Found {len(unique_links)} unique product links")
 
                 for link in unique_links[:50]:  # Limit to first 50 to avoid overwhelming
-                    product_data = self._extract_product_from_link(link, url, selectors)
+                    product_data = self._extract_product_from_link(link, origin, selectors)
                     if product_data:
                         products.append(product_data)
 
@@ -99,26 +297,21 @@ class HTMLScraper:
         logger.debug(f"Scraping product page: {url}")
 
         try:
-            # Respect delay between requests
-            time.sleep(self.delay)
-
-            # Try with retry logic
-            max_retries = 3
-            response = None
-            for attempt in range(max_retries):
-                try:
-                    response = self.session.get(url, timeout=15)  # Increased timeout
-                    response.raise_for_status()
-                    break
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 * (attempt + 1))  # Exponential backoff
-                    else:
-                        logger.error(f"All attempts failed for {url}")
-                        return None
-
-            soup = BeautifulSoup(response.content, 'lxml')
+            # Respect the request rate for this merchant
+            bucket = self._bucket_for(url)
+            if bucket:
+                bucket.acquire()
+
+            # Transient failures are retried by the session adapter; what reaches here is final
+            try:
+                body, encoding = self._get_body(url, timeout=15)  # Increased timeout
+            except requests.RequestException as e:
+                logger.error(f"Failed to fetch {url}: {e}")
+                return None
+
+            soup = BeautifulSoup(body, 'lxml', from_encoding=encoding)
+            # Parse the URL once; the external ID and image base both come from it
+            parsed_url = urlparse(url)
 
             product_data = {
                 'source': config.get('source'),
@@ -130,34 +323,19 @@ class HTMLScraper:
             }
 
             # Extract external_id from URL
-            external_id = self._extract_external_id(url)
+            external_id = self._extract_external_id(parsed_url)
             if external_id:
                 product_data['external_id'] = external_id
             else:
                 # Fallback: use the product URL path
-                parsed_url = urlparse(url)
                 product_data['external_id'] = parsed_url.path.strip('/').replace('/', '-')
 
-            # Extract title - try multiple selectors for product pages
-            title = None
-
-            # Try specific product title selectors first
-            title_selectors = [
-                'h1.product-title',
-                '.product-title',
-                'h1',
-                '[class*="title"]',
-                '.title'
-            ]
-
-            for selector in title_selectors:
-                title_elem = soup.select_one(selector)
-                if title_elem:
-                    candidate_title = title_elem.get_text(strip=True)
-                    # Skip if it's a generic page title or collection title
-                    if candidate_title and len(candidate_title) > 3 and not any(skip in candidate_title.lower() for skip in ['all products', 'collection', 'scuffers', 'size guide']):
-                        title = candidate_title
-                        break
+            # Extract title - try specific product title selectors first, skipping
+            # generic page titles and collection titles
+            title = self._first_text_by_priority(
+                soup, TITLE_SELECTORS,
+                lambda text: len(text) > 3 and not TITLE_SKIP_RE.search(text)
+            )
 
             # Fallback: try to extract from meta tags
             if not title:
@@ -177,31 +355,12 @@ class HTMLScraper:
                 product_data['title'] = title
 
             # Extract price (multi-currency: "20 USD, 450 CZK, 75 PLN" etc.)
-            price = None
-
             # Try direct price selectors — keep full text so DB can normalize to "20USD,450CZK,75PLN"
-            price_selectors = [
-                '.price',
-                '[data-price]',
-                '.product-price',
-                '[class*="price"]',
-                '.money'
-            ]
-
-            for selector in price_selectors:
-                price_elem = soup.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text(strip=True)
-                    # Skip if this looks like filter/navigation text
-                    if any(skip_word in price_text.lower() for skip_word in [
-                        'price', 'low to high', 'high to low', 'filter', 'sort',
-                        'new arrivals', 'best sellers', 'on sale'
-                    ]):
-                        continue
-                    # Prefer full text (handles "20 USD, 450 CZK" or "139,00 EUR")
-                    if re.search(r'\d', price_text):
-                        price = price_text
-                        break
+            # (handles "20 USD, 450 CZK" or "139,00 EUR"), skipping filter/navigation text
+            price = self._first_text_by_priority(
+                soup, PRICE_SELECTORS,
+                lambda text: DIGIT_RE.search(text) and not PRICE_SKIP_RE.search(text)
+            )
 
             # Try to find price in script tags or other elements
             if not price:
@@ -213,13 +372,14 @@ class HTMLScraper:
                 if meta_price and meta_price.get('content'):
                     price = meta_price.get('content')
 
-            # Try JSON-LD structured data
+            # Try JSON-LD structured data (only blocks that mention a price are decoded)
             if not price:
                 json_ld_scripts = soup.find_all('script', type='application/ld+json')
                 for script in json_ld_scripts:
+                    if not script.string or '"price"' not in script.string:
+                        continue
                     try:
-                        import json
-                        data = json.loads(script.string)
+                        data = orjson.loads(script.string)
                         if isinstance(data, dict) and 'offers' in data:
                             offers = data['offers']
                             if isinstance(offers, list) and offers:
@@ -232,31 +392,23 @@ class HTMLScraper:
                             if 'price' in offer:
                                 price = str(offer['price'])
                                 break
-                    except (json.JSONDecodeError, KeyError):
+                    except (orjson.JSONDecodeError, KeyError):
                         continue
 
             if price:
                 product_data['price'] = price
 
             # Extract sale price (same multi-currency format; null if no sale)
-            sale = None
-            sale_selectors = [
-                '.sale-price', '.price--sale', '[data-sale-price]',
-                '.compare-at-price', '.product-price--sale', '[class*="sale"]'
-            ]
-            for selector in sale_selectors:
-                sale_elem = soup.select_one(selector)
-                if sale_elem:
-                    sale_text = sale_elem.get_text(strip=True)
-                    if sale_text and re.search(r'\d', sale_text) and sale_text != price:
-                        sale = sale_text
-                        break
+            sale = self._first_text_by_priority(
+                soup, SALE_SELECTORS,
+                lambda text: DIGIT_RE.search(text) and text != price
+            )
             if sale:
                 product_data['sale'] = sale
 
             # Extract ALL product images: scope to product content to avoid shared header/logo
             # Main image goes to image_url and gets embedded; rest to additional_images (comma-sep)
-            base_url_parsed = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+            base_url_parsed = f"{parsed_url.scheme}://{parsed_url.netloc}"
             product_image_urls = self._extract_all_product_images(soup, base_url_parsed, selectors)
 
             if product_image_urls:
@@ -264,12 +416,16 @@ class HTMLScraper:
                 if len(product_image_urls) > 1:
                     product_data['additional_images'] = ','.join(product_image_urls[1:])
 
-            # Extract sizes
+            # Extract sizes; a data-size attribute already holds the label, so the
+            # element's text is only assembled when it is missing
             size_elements = soup.select(selectors.get('sizes', '.size-option, [data-size]'))
             if size_elements:
-                sizes = [elem.get_text(strip=True) for elem in size_elements if elem.get_text(strip=True)]
+                sizes = ', '.join(
+                    text for elem in size_elements
+                    if (text := (elem.get('data-size') or '').strip() or elem.get_text(strip=True))
+                )
                 if sizes:
-                    product_data['size'] = ', '.join(sizes)
+                    product_data['size'] = sizes
 
             # Try to determine gender
             gender = self._determine_gender(soup, selectors, url)
@@ -277,31 +433,18 @@ class HTMLScraper:
                 product_data['gender'] = gender
 
             # Extract description first (used below for category inference)
-            desc_elem = soup.select_one(
-                '.metafield-rich_text_field .rte, .metafield-rich_text_field p, '
-                '.metafield-rich_text_field, .product-description, .description, [data-description]'
-            )
+            desc_elem = DESCRIPTION_SELECTOR.select_one(soup)
             if desc_elem:
                 product_data['description'] = desc_elem.get_text(separator=' ', strip=True)
 
             # Infer category from title/description when not from URL or page
             if not product_data.get('category'):
-                try:
-                    from .category import infer_category_from_text
-                    inferred = infer_category_from_text(
-                        product_data.get('title'),
-                        product_data.get('description'),
-                    )
-                    if inferred:
-                        product_data['category'] = inferred
-                except ImportError:
-                    from category import infer_category_from_text
-                    inferred = infer_category_from_text(
-                        product_data.get('title'),
-                        product_data.get('description'),
-                    )
-                    if inferred:
-                        product_data['category'] = inferred
+                inferred = infer_category_from_text(
+                    product_data.get('title'),
+                    product_data.get('description'),
+                )
+                if inferred:
+                    product_data['category'] = inferred
 
             logger.debug(f"Extracted product data: {product_data}")
             return product_data
@@ -310,6 +453,105 @@ class HTMLScraper:
             logger.error(f"Failed to scrape product page {url}: {e}")
             return None
 
+    async def scrape_product_pages(self, urls: List[str], selectors: Dict[str, str], config: Dict[str, Any],
+                                   max_concurrency: int = 8) -> List[Optional[Dict[str, Any]]]:
+        """
+        Scrape several product pages concurrently.
+
+        Each page is scraped by scrape_product_page in a pool of max_concurrency worker
+        threads, which share the session's connection pool and request rate. A URL that
+        appears more than once (e.g. listed in several categories) is fetched once.
+
+        Args:
+            urls: Product page URLs
+            selectors: CSS selectors for extracting data
+            config: Site configuration
+            max_concurrency: Maximum number of pages fetched at the same time
+
+        Returns:
+            Product dictionaries (None for pages that failed), in the same order as urls;
+            repeated URLs share the same dictionary
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        loop = asyncio.get_running_loop()
+        # A dedicated pool: the default executor may have fewer threads than max_concurrency
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, self.scrape_product_page, url, selectors, config)
+                for url in unique_urls
+            ))
+        by_url = dict(zip(unique_urls, results))
+        return [by_url[url] for url in urls]
+
+    @staticmethod
+    def _first_text_by_priority(soup: BeautifulSoup, selectors, accept) -> Optional[str]:
+        """
+        Return the text of the first match of the highest-priority selector that passes accept.
+
+        Equivalent to calling select_one for each selector in turn, but the page is walked
+        once with the union selector and the candidates are then ranked.
+
+        Args:
+            soup: Parsed page
+            selectors: Compiled (union, per-selector) pair from _compile_selectors
+            accept: Predicate on the stripped, non-empty element text
+
+        Returns:
+            Accepted text or None
+        """
+        union, ranked = selectors
+        candidates = union.select(soup)
+        for selector in ranked:
+            elem = next((c for c in candidates if selector.match(c)), None)
+            if elem:
+                text = elem.get_text(strip=True)
+                if text and accept(text):
+                    return text
+        return None
+
+    def _get_body(self, url: str, timeout: float) -> Tuple[bytes, Optional[str]]:
+        """
+        Fetch a page and return its decoded body, truncated to max_body_bytes.
+
+        When a cached copy exists the request is made conditional, and a 304 response
+        returns the cached body without downloading it again.
+
+        Args:
+            url: Page URL
+            timeout: Request timeout in seconds
+
+        Returns:
+            Tuple of (response body bytes, charset from the Content-Type header or None)
+        """
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        with self.session.get(url, timeout=timeout, stream=True, headers=headers) as response:
+            if cached and response.status_code == 304:
+                logger.debug(f"Not modified, using cached body: {url}")
+                # 304s rarely repeat Content-Type; the page's own meta charset still applies
+                return cached[2], None
+            response.raise_for_status()
+            body = response.raw.read(self.max_body_bytes, decode_content=True)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            charset = CHARSET_RE.search(response.headers.get('Content-Type', ''))
+
+        if len(body) >= self.max_body_bytes:
+            logger.warning(f"Truncated response body for {url} at {self.max_body_bytes} bytes")
+        elif self.cache and (etag or last_modified):
+            try:
+                self.cache.put(url, etag, last_modified, body)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to cache {url}: {e}")
+        return body, charset.group(1) if charset else None
+
     def _extract_all_product_images(self, soup: BeautifulSoup, base_url: str, selectors: Dict[str, str]) -> List[str]:
         """
         Extract all product image URLs from a product page, scoped to product content
@@ -324,22 +566,16 @@ class HTMLScraper:
             if src.startswith('//'):
                 src = 'https:' + src
             elif src.startswith('/'):
-                src = urljoin(base_url, src)
+                # base_url is the page origin, so an absolute path only needs prefixing
+                src = base_url + src
             return src
 
         def is_product_image(src: str, img_elem) -> bool:
-            src_lower = src.lower()
-            alt = (img_elem.get('alt') or '').lower()
-            classes = ' '.join(img_elem.get('class', [])).lower()
-            if any(skip in src_lower for skip in ['logo', 'icon', 'social', 'flag', 'placeholder']):
+            if len(src) < 30 or IMAGE_SRC_SKIP_RE.search(src) or not IMAGE_EXT_RE.search(src):
                 return False
-            if any(skip in alt for skip in ['logo', 'icon', 'flag', 'scuffers']):
+            if IMAGE_ALT_SKIP_RE.search(img_elem.get('alt') or ''):
                 return False
-            if 'logo' in classes or 'icon' in classes:
-                return False
-            if not any(ext in src_lower for ext in ['jpg', 'jpeg', 'png', 'webp']):
-                return False
-            if len(src) < 30:
+            if IMAGE_CLASS_SKIP_RE.search(' '.join(img_elem.get('class', []))):
                 return False
             return True
 
@@ -369,17 +605,19 @@ class HTMLScraper:
 
         return urls
 
-    def _extract_product_from_listing(self, container, base_url: str, selectors: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    def _extract_product_from_listing(self, container, origin: str, selectors: Dict[str, str],
+                                      seen: Optional[Set[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Extract basic product info from a listing container.
 
         Args:
             container: BeautifulSoup element containing product listing
-            base_url: Base URL for relative links
+            origin: Page origin ("scheme://host") for root-relative links
             selectors: CSS selectors
+            seen: Product URLs already extracted from this page; updated in place
 
         Returns:
-            Basic product dictionary or None
+            Basic product dictionary or None (also for a URL already in seen)
         """
         try:
             # Extract product URL
@@ -388,16 +626,20 @@ class HTMLScraper:
                 return None
 
             product_url = link_elem.get('href')
-            if product_url:
-                if product_url.startswith('/'):
-                    base_parsed = urlparse(base_url)
-                    product_url = f"{base_parsed.scheme}://{base_parsed.netloc}{product_url}"
-            else:
+            if not product_url:
                 return None
 
+            if product_url.startswith('/'):
+                product_url = f"{origin}{product_url}"
+
+            if seen is not None:
+                if product_url in seen:
+                    return None
+                seen.add(product_url)
+
             product_data = {
                 'product_url': product_url,
-                'external_id': self._extract_external_id(product_url) or product_url.split('/')[-1]
+                'external_id': self._extract_external_id(urlparse(product_url)) or product_url.split('/')[-1]
             }
 
             # Extract title
@@ -418,8 +660,7 @@ class HTMLScraper:
                     if img_url.startswith('//'):
                         img_url = 'https:' + img_url
                     elif img_url.startswith('/'):
-                        base_parsed = urlparse(base_url)
-                        img_url = f"{base_parsed.scheme}://{base_parsed.netloc}{img_url}"
+                        img_url = f"{origin}{img_url}"
                     product_data['image_url'] = img_url
 
             return product_data
@@ -428,13 +669,13 @@ class HTMLScraper:
             logger.error(f"Failed to extract product from listing: {e}")
             return None
 
-    def _extract_product_from_link(self, link_elem, base_url: str, selectors: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    def _extract_product_from_link(self, link_elem, origin: str, selectors: Dict[str, str]) -> Optional[Dict[str, Any]]:
         """
         Extract basic product info from a product link element.
 
         Args:
             link_elem: BeautifulSoup link element
-            base_url: Base URL for relative links
+            origin: Page origin ("scheme://host") for root-relative links
             selectors: CSS selectors
 
         Returns:
@@ -446,23 +687,24 @@ class HTMLScraper:
                 return None
 
             if product_url.startswith('/'):
-                base_parsed = urlparse(base_url)
-                product_url = f"{base_parsed.scheme}://{base_parsed.netloc}{product_url}"
+                product_url = f"{origin}{product_url}"
 
             product_data = {
                 'product_url': product_url,
-                'external_id': self._extract_external_id(product_url) or product_url.split('/')[-1]
+                'external_id': self._extract_external_id(urlparse(product_url)) or product_url.split('/')[-1]
             }
 
             # Try to extract title from link text or nearby elements
             link_text = link_elem.get_text(strip=True)
             if link_text and len(link_text) > 10:  # Likely a product title
                 # Clean up the text (remove size info, etc.)
-                title = link_text.split(' EUR')[0]  # Remove price part
-                title = title.split(' +')[0]  # Remove stock indicator
-                # Remove size indicators
-                import re
-                title = re.sub(r'\b(XS|S|M|L|XL|XXL|\d+)\b', '', title).strip()
+                # Remove price part, then stock indicator
+                title = link_text.partition(' EUR')[0].partition(' +')[0]
+                # Remove size indicators and stray numbers (sizes, or a price without " EUR")
+                title = ' '.join(
+                    word for word in title.split()
+                    if word not in SIZE_TOKENS and not word.replace(',', '').replace('.', '').isdigit()
+                )
                 if title:
                     product_data['title'] = title
 
@@ -471,8 +713,7 @@ class HTMLScraper:
             if parent:
                 # Look for price patterns in parent text
                 parent_text = parent.get_text()
-                import re
-                price_match = re.search(r'(\d+,\d+)\s*EUR', parent_text)
+                price_match = EUR_PRICE_RE.search(parent_text)
                 if price_match:
                     product_data['price'] = price_match.group(1) + ' EUR'
 
@@ -484,8 +725,7 @@ class HTMLScraper:
                         if img_url.startswith('//'):
                             img_url = 'https:' + img_url
                         elif img_url.startswith('/'):
-                            base_parsed = urlparse(base_url)
-                            img_url = f"{base_parsed.scheme}://{base_parsed.netloc}{img_url}"
+                            img_url = f"{origin}{img_url}"
                         product_data['image_url'] = img_url
 
             return product_data
@@ -494,33 +734,17 @@ class HTMLScraper:
             logger.error(f"Failed to extract product from link: {e}")
             return None
 
-    def _extract_external_id(self, url: str) -> Optional[str]:
+    def _extract_external_id(self, parsed: ParseResult) -> Optional[str]:
         """
         Extract external ID from product URL.
 
         Args:
-            url: Product URL
+            parsed: Product URL, already split by urlparse
 
         Returns:
             External ID or None
         """
-        # For Shopify stores, the product ID is often in the URL path
-        # e.g., /products/new-navy-raw-jacket -> new-navy-raw-jacket
-        parsed = urlparse(url)
-        path_parts = parsed.path.strip('/').split('/')
-
-        if 'products' in path_parts:
-            products_index = path_parts.index('products')
-            if products_index + 1 < len(path_parts):
-                product_handle = path_parts[products_index + 1]
-                # Try to extract numeric ID if present
-                match = re.search(r'(\d+)', product_handle)
-                if match:
-                    return match.group(1)
-                else:
-                    return product_handle
-
-        return None
+        return _external_id_from_path(parsed.path)
 
     def _find_price_in_page(self, soup: BeautifulSoup) -> Optional[str]:
         """
@@ -532,17 +756,20 @@ class HTMLScraper:
         Returns:
             Price string or None
         """
-        # Look in script tags for JSON data
-        scripts = soup.find_all('script', string=re.compile(r'price|Price'))
-        for script in scripts:
-            match = re.search(r'"price":\s*"([^"]+)"', script.string or '')
+        # Look in script tags for JSON data; a plain substring test rules out most
+        # scripts before the regex runs
+        for script in soup.find_all('script'):
+            text = script.string
+            if not text or '"price"' not in text:
+                continue
+            match = PRICE_JSON_RE.search(text)
             if match:
                 return match.group(1)
 
         # Look for data attributes
-        price_elements = soup.find_all(attrs={'data-price': True})
-        if price_elements:
-            return price_elements[0].get('data-price')
+        price_elem = soup.select_one('[data-price]')
+        if price_elem:
+            return price_elem.get('data-price')
 
         return None
 
@@ -559,57 +786,50 @@ class HTMLScraper:
             'men', 'women', or None
         """
         # Check URL for gender indicators
-        url_lower = url.lower()
-        if 'women' in url_lower or 'woman' in url_lower or 'female' in url_lower:
-            return 'women'
-        elif 'men' in url_lower or 'man' in url_lower or 'male' in url_lower:
-            return 'men'
+        gender = self._match_gender(url)
+        if gender:
+            return gender
 
         # Check meta description for gender indicators (e.g., "Model (man) wearing...")
         meta_desc = soup.select_one('meta[name="description"]')
         if meta_desc:
-            desc_content = meta_desc.get('content', '').lower()
-            if '(man)' in desc_content or '(male)' in desc_content or 'man wearing' in desc_content:
+            desc_content = meta_desc.get('content', '')
+            if MEN_META_RE.search(desc_content):
                 return 'men'
-            elif '(woman)' in desc_content or '(female)' in desc_content or 'woman wearing' in desc_content:
+            elif WOMEN_META_RE.search(desc_content):
                 return 'women'
 
         # Check breadcrumbs for gender context
         breadcrumbs = soup.select('.breadcrumb, .breadcrumbs, [class*="breadcrumb"]')
         for crumb in breadcrumbs:
-            crumb_text = crumb.get_text().lower()
-            if 'women' in crumb_text or 'woman' in crumb_text or 'female' in crumb_text:
-                return 'women'
-            elif 'men' in crumb_text or 'man' in crumb_text or 'male' in crumb_text:
-                return 'men'
-
-        # Check page title
-        title_elem = soup.select_one('title')
-        if title_elem:
-            title_text = title_elem.get_text().lower()
-            if 'women' in title_text or 'woman' in title_text:
-                return 'women'
-            elif 'men' in title_text or 'man' in title_text:
-                return 'men'
+            gender = self._match_gender(crumb.get_text())
+            if gender:
+                return gender
 
-        # Check specific selectors
-        gender_elem = soup.select_one(selectors.get('gender', '.gender, .category'))
-        if gender_elem:
-            gender_text = gender_elem.get_text().lower()
-            if 'women' in gender_text or 'woman' in gender_text:
-                return 'women'
-            elif 'men' in gender_text or 'man' in gender_text:
-                return 'men'
+        # Check page title, then the site's gender selector
+        for selector in ('title', selectors.get('gender', '.gender, .category')):
+            elem = soup.select_one(selector)
+            gender = self._match_gender(elem.get_text()) if elem else None
+            if gender:
+                return gender
 
         # Check product description for gender indicators
         desc_elem = soup.select_one('.product-description, .description, [class*="description"]')
         if desc_elem:
-            desc_text = desc_elem.get_text().lower()
-            if any(term in desc_text for term in ['men\'s', 'man\'s', 'male', 'unisex']):
-                if 'unisex' in desc_text:
-                    return None  # Could be either
-                elif any(term in desc_text for term in ['men\'s', 'man\'s', 'male']):
-                    return 'men'
+            desc_text = desc_elem.get_text()
+            if 'unisex' in desc_text.lower():
+                return None  # Could be either
+            elif MEN_DESCRIPTION_RE.search(desc_text):
+                return 'men'
 
         # Default to None - will be determined by collection context
         return None
+
+    @staticmethod
+    def _match_gender(text: str) -> Optional[str]:
+        """Return 'women' or 'men' if text names a gender (women's terms win), else None."""
+        if WOMEN_RE.search(text):
+            return 'women'
+        if MEN_RE.search(text):
+            return 'men'
+        return None
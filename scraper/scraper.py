@@ -3,8 +3,11 @@ Main scraper module for fashion brands.
 Coordinates HTML scraping, embedding generation, and database operations.
 """
 
+import asyncio
+import copy
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 import yaml
 import os
@@ -12,17 +15,34 @@ import os
 try:
     from .html_scraper import HTMLScraper
     from .browser_scraper import BrowserScraper
-    from .embeddings import get_batch_embeddings, get_text_embedding
+    from .embeddings import get_batch_embeddings, get_batch_text_embeddings
     from .database import upsert_products
 except ImportError:
     from html_scraper import HTMLScraper
     from browser_scraper import BrowserScraper
-    from embeddings import get_batch_embeddings, get_text_embedding
+    from embeddings import get_batch_embeddings, get_batch_text_embeddings
     from database import upsert_products
 
+# libyaml's C loader when PyYAML was built with it; same safe subset, much faster
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=8)
+def _load_yaml(path: str, mtime: float) -> Dict[str, Any]:
+    """Parse a YAML file; mtime is part of the cache key so edits are picked up."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+# Product pages that come back empty are retried this many times in total, backing off
+# between rounds; transient HTTP errors are already retried inside the HTML scraper
+PRODUCT_PAGE_ATTEMPTS = 3
+
+
 def _build_product_info_text(product: Dict[str, Any]) -> str:
     """
     Build a single text string from product fields for info_embedding / AI search.
@@ -62,14 +82,33 @@ class FashionScraper:
     def __init__(self, config_path: str = 'sites.yaml'):
         self.config = self._load_config(config_path)
         self.user_agent = os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-        self.html_scraper = HTMLScraper(user_agent=self.user_agent, delay=2.0)
+        self.html_scraper = HTMLScraper(
+            user_agent=self.user_agent,
+            delay=2.0,
+            cache_path=os.getenv('HTTP_CACHE_PATH', '.http-cache.sqlite'),
+        )
         self.browser_scraper = None  # Will be initialized when needed
+        # Embedding work runs off the event loop on one thread, so concurrent sites keep
+        # scraping while the model runs and never use it at the same time
+        self.embedding_executor = ThreadPoolExecutor(max_workers=1)
+        self._browser_holders = 0  # Open `async with` blocks keeping the browser alive
+
+    async def __aenter__(self):
+        # Inside `async with`, the shared browser outlives individual scrape_site_async
+        # calls and is closed on exit instead, so several sites reuse one launch
+        self._browser_holders += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._browser_holders -= 1
+        if not self._browser_holders:
+            await self._close_browser()
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load scraper configuration from YAML file."""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            # Copied so a caller editing its config can't change the cached one
+            return copy.deepcopy(_load_yaml(config_path, os.path.getmtime(config_path)))
         except Exception as e:
             logger.error(f"Failed to load config from {config_path}: {e}")
             return {}
@@ -78,6 +117,8 @@ class FashionScraper:
         """
         Scrape a specific site.
 
+        Synchronous entry point for scripts; from async code, await scrape_site_async instead.
+
         Args:
             site_name: Name of the site to scrape (key in config)
             sync: Whether to sync to database
@@ -86,18 +127,11 @@ class FashionScraper:
         Returns:
             True if successful
         """
-        # Run the async version in a new event loop
-        import asyncio
         try:
-            return asyncio.run(self.scrape_site_async(site_name, sync, limit))
+            asyncio.get_running_loop()
         except RuntimeError:
-            # If already in an event loop, create a new one
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                return loop.run_until_complete(self.scrape_site_async(site_name, sync, limit))
-            finally:
-                loop.close()
+            return asyncio.run(self.scrape_site_async(site_name, sync, limit))
+        raise RuntimeError("scrape_site() cannot run inside an event loop; await scrape_site_async() instead")
 
     async def scrape_site_async(self, site_name: str, sync: bool = True, limit: Optional[int] = None) -> bool:
         """
@@ -111,6 +145,14 @@ class FashionScraper:
         Returns:
             True if successful
         """
+        try:
+            return await self._scrape_site(site_name, sync, limit)
+        finally:
+            if not self._browser_holders:
+                await self._close_browser()
+
+    async def _scrape_site(self, site_name: str, sync: bool, limit: Optional[int]) -> bool:
+        """Scrape one site, leaving the shared browser open for the caller to close."""
         if site_name not in self.config:
             logger.error(f"Site '{site_name}' not found in config")
             return False
@@ -119,24 +161,37 @@ class FashionScraper:
         logger.info(f"Starting scrape for {site_name}")
 
         try:
-            products = []
+            total = 0
+            synced = True
+            pending_write = None
+            loop = asyncio.get_running_loop()
+            categories = site_config.get('categories', [])
+            mode = site_config.get('mode', 'html')
+
+            if mode == 'browser':
+                # Load every dynamic category page concurrently up front
+                logger.info("Using browser scraper for dynamic content loading")
+                browser_listings = await self._scrape_with_browser(
+                    [category['url'] for category in categories],
+                    site_config
+                )
 
             # Scrape each category
-            for category in site_config.get('categories', []):
+            for index, category in enumerate(categories):
                 category_url = category['url']
                 category_name = category.get('name', category_url)
 
                 logger.info(f"Scraping category: {category_name}")
+                category_products = []
 
                 # Get product listings from category page
-                mode = site_config.get('mode', 'html')
                 if mode == 'browser':
-                    # Use browser scraper for dynamic content
-                    logger.info("Using browser scraper for dynamic content loading")
-                    listings = await self._scrape_with_browser(category_url, site_config)
+                    listings = browser_listings[index]
                 else:
-                    # Use HTML scraper for static content
-                    listings = self.html_scraper.scrape_category_page(
+                    # Use HTML scraper for static content, in a thread so other sites keep running
+                    listings = await loop.run_in_executor(
+                        None,
+                        self.html_scraper.scrape_category_page,
                         category_url,
                         site_config.get('selectors', {})
                     )
@@ -144,104 +199,59 @@ class FashionScraper:
                 if limit:
                     listings = listings[:limit]
 
-                # Scrape individual product pages
-                for listing in listings:
-                    product_url = listing.get('product_url')
-                    if product_url:
-                        logger.debug(f"Scraping product page: {product_url}")
-
-                        # Try to scrape individual product page with retry logic
-                        product_data = None
-                        max_retries = 3
-                        for attempt in range(max_retries):
-                            try:
-                                product_data = self.html_scraper.scrape_product_page(
-                                    product_url,
-                                    site_config.get('selectors', {}),
-                                    site_config
-                                )
-                                if product_data:
-                                    break
-                            except Exception as e:
-                                logger.warning(f"Attempt {attempt + 1} failed for {product_url}: {e}")
-                                if attempt < max_retries - 1:
-                                    import time
-                                    time.sleep(2 * (attempt + 1))  # Exponential backoff
-
-                        if product_data:
-                            # Merge listing data with detailed product data
-                            # Use listing data as base, then update with detailed data
-                            merged_product = dict(listing)  # Start with listing data
-                            merged_product.update(product_data)  # Override with detailed data
-
-                            # Generate image embedding for main product image
-                            image_url = merged_product.get('image_url')
-                            if image_url:
-                                logger.debug(f"Generating image embedding for {product_url}")
-                                try:
-                                    img_emb = get_batch_embeddings([image_url])[0]
-                                    if img_emb:
-                                        merged_product['image_embedding'] = img_emb
-                                        logger.debug(f"Generated image embedding: {len(img_emb)} dimensions")
-                                    else:
-                                        logger.warning(f"Failed to generate image embedding for {product_url}")
-                                except Exception as e:
-                                    logger.error(f"Error generating image embedding for {product_url}: {e}")
-
-                            # Generate info embedding (all product text for AI search)
-                            info_text = _build_product_info_text(merged_product)
-                            if info_text:
-                                try:
-                                    info_emb = get_text_embedding(info_text)
-                                    if info_emb:
-                                        merged_product['info_embedding'] = info_emb
-                                except Exception as e:
-                                    logger.warning(f"Info embedding failed for {product_url}: {e}")
-
-                            products.append(merged_product)
-                        else:
-                            # If detailed scraping failed, still include the basic listing data
-                            logger.warning(f"Detailed scraping failed for {product_url}, using basic listing data")
-                            basic_product = dict(listing)
-                            basic_product.update({
-                                'source': site_config.get('source'),
-                                'brand': site_config.get('brand'),
-                                'second_hand': site_config.get('second_hand', False),
-                                'merchant_name': site_config.get('merchant_name'),
-                                'country': site_config.get('country', 'eu'),
-                            })
-                            if basic_product.get('image_url'):
-                                try:
-                                    emb = get_batch_embeddings([basic_product['image_url']])[0]
-                                    if emb:
-                                        basic_product['image_embedding'] = emb
-                                except Exception:
-                                    pass
-                            info_text = _build_product_info_text(basic_product)
-                            if info_text:
-                                try:
-                                    info_emb = get_text_embedding(info_text)
-                                    if info_emb:
-                                        basic_product['info_embedding'] = info_emb
-                                except Exception:
-                                    pass
-                            products.append(basic_product)
-
-                        # Log progress
-                        if len(products) % 10 == 0:
-                            logger.info(f"Processed {len(products)} products so far")
-
-            if not products:
+                # Scrape individual product pages concurrently
+                listings = [listing for listing in listings if listing.get('product_url')]
+                details = await self._scrape_product_pages(
+                    [listing['product_url'] for listing in listings],
+                    site_config
+                )
+                for listing, product_data in zip(listings, details):
+                    product_url = listing['product_url']
+                    if product_data:
+                        # Merge listing data with detailed product data
+                        # Use listing data as base; detailed data overrides it
+                        # Info and image embeddings are generated for the whole category below
+                        category_products.append({**listing, **product_data})
+                    else:
+                        # If detailed scraping failed, still include the basic listing data
+                        logger.warning(f"Detailed scraping failed for {product_url}, using basic listing data")
+                        category_products.append({
+                            **listing,
+                            'source': site_config.get('source'),
+                            'brand': site_config.get('brand'),
+                            'second_hand': site_config.get('second_hand', False),
+                            'merchant_name': site_config.get('merchant_name'),
+                            'country': site_config.get('country', 'eu'),
+                        })
+
+                    # Log progress
+                    if (total + len(category_products)) % 10 == 0:
+                        logger.info(f"Processed {total + len(category_products)} products so far")
+
+                if not category_products:
+                    continue
+                total += len(category_products)
+                await loop.run_in_executor(self.embedding_executor, self._add_embeddings, category_products)
+
+                # Sync to database if requested: each category is written in the background
+                # while the next one is scraped, so only one category is held at a time
+                if sync:
+                    if pending_write and not await pending_write:
+                        synced = False
+                    logger.info(f"Syncing {len(category_products)} products from {category_name} to database...")
+                    pending_write = loop.run_in_executor(None, upsert_products, category_products)
+
+            if pending_write and not await pending_write:
+                synced = False
+
+            if not total:
                 logger.warning(f"No products found for {site_name}")
                 return False
 
-            logger.info(f"Successfully scraped {len(products)} products from {site_name}")
+            logger.info(f"Successfully scraped {total} products from {site_name}")
 
-            # Sync to database if requested
             if sync:
-                logger.info("Syncing products to database...")
-                success = upsert_products(products)
-                if success:
+                if synced:
                     logger.info("Successfully synced products to database")
                 else:
                     logger.error("Failed to sync products to database")
@@ -253,29 +263,139 @@ class FashionScraper:
             logger.error(f"Failed to scrape site {site_name}: {e}")
             return False
 
-    async def _scrape_with_browser(self, url: str, site_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def _scrape_product_pages(self, urls: List[str], site_config: Dict[str, Any]) -> List[Optional[Dict[str, Any]]]:
         """
-        Scrape products using browser automation for dynamic content.
+        Scrape product pages concurrently, retrying the ones that fail.
 
         Args:
-            url: Category URL to scrape
+            urls: Product page URLs
             site_config: Site configuration
 
         Returns:
-            List of product listings
+            Product dictionaries (None where every attempt failed), in the same order as urls
+        """
+        selectors = site_config.get('selectors', {})
+        results = await self.html_scraper.scrape_product_pages(urls, selectors, site_config)
+
+        for attempt in range(1, PRODUCT_PAGE_ATTEMPTS):
+            failed = [i for i, result in enumerate(results) if not result]
+            if not failed:
+                break
+            logger.warning(f"Retrying {len(failed)} product pages (attempt {attempt + 1})")
+            await asyncio.sleep(2 * attempt)  # Exponential backoff
+            retried = await self.html_scraper.scrape_product_pages(
+                [urls[i] for i in failed], selectors, site_config
+            )
+            for i, result in zip(failed, retried):
+                results[i] = result
+
+        return results
+
+    def _add_embeddings(self, products: List[Dict[str, Any]]):
+        """Attach info and image embeddings to a category's products (blocking; run off the event loop)."""
+        self._add_info_embeddings(products)
+        self._add_image_embeddings(products)
+
+    def _add_info_embeddings(self, products: List[Dict[str, Any]]):
+        """
+        Attach an info_embedding (all product text, for AI search) to every product with text.
+
+        All texts are embedded in one get_batch_text_embeddings call, so the text encoder
+        runs on full batches instead of one product at a time.
+
+        Args:
+            products: Product dictionaries, updated in place
+        """
+        texts = [_build_product_info_text(product) for product in products]
+        try:
+            embeddings = get_batch_text_embeddings(texts)
+        except Exception as e:
+            logger.warning(f"Error generating info embeddings: {e}")
+            return
+
+        for product, embedding in zip(products, embeddings):
+            if embedding:
+                product['info_embedding'] = embedding
+
+    def _add_image_embeddings(self, products: List[Dict[str, Any]]):
+        """
+        Attach an image_embedding to every product with a main image.
+
+        All main images are embedded in one get_batch_embeddings call, so the model runs
+        on full batches instead of one image at a time. Variants sharing an image are
+        embedded once.
+
+        Args:
+            products: Product dictionaries, updated in place
         """
+        pending = [product for product in products if product.get('image_url')]
+        if not pending:
+            return
+
+        image_urls = list(dict.fromkeys(product['image_url'] for product in pending))
+        logger.info(f"Generating image embeddings for {len(pending)} products ({len(image_urls)} unique images)")
+        try:
+            embeddings = dict(zip(image_urls, get_batch_embeddings(image_urls)))
+        except Exception as e:
+            logger.error(f"Error generating image embeddings: {e}")
+            return
+
+        failed = 0
+        for product in pending:
+            embedding = embeddings.get(product['image_url'])
+            if embedding:
+                product['image_embedding'] = embedding
+            else:
+                failed += 1
+                logger.debug(f"Failed to generate image embedding for {product.get('product_url')}")
+        if failed:
+            logger.warning(f"Failed to generate image embeddings for {failed}/{len(pending)} products")
+
+    async def _ensure_browser(self):
+        """Start the shared browser scraper if it isn't running yet."""
         if not self.browser_scraper:
-            self.browser_scraper = BrowserScraper(user_agent=self.user_agent)
+            # Launched once and reused for every browser-mode category; closed by
+            # scrape_site_async, or on leaving `async with scraper:`
+            self.browser_scraper = BrowserScraper(
+                user_agent=self.user_agent,
+                user_data_dir=os.getenv('BROWSER_PROFILE_DIR', '.pw-profile'),
+            )
+            await self.browser_scraper.__aenter__()
+
+    async def _close_browser(self):
+        """Shut down the shared browser scraper, if one was started."""
+        if self.browser_scraper:
+            try:
+                await self.browser_scraper.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Failed to close browser: {e}")
+            self.browser_scraper = None
+
+    async def _scrape_with_browser(self, urls: List[str], site_config: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """
+        Scrape products using browser automation for dynamic content.
+
+        Category pages are loaded concurrently, each in its own page of the shared browser.
+
+        Args:
+            urls: Category URLs to scrape
+            site_config: Site configuration
+
+        Returns:
+            List of product listings per category, in the same order as urls
+        """
+        await self._ensure_browser()
 
         max_products = 2000  # Higher limit for browser scraping to capture all products
-        products = await self.browser_scraper.scrape_all_products(
-            url,
+        results = await self.browser_scraper.scrape_many(
+            urls,
             site_config.get('selectors', {}),
             max_products=max_products
         )
 
-        logger.info(f"Browser scraper found {len(products)} products")
-        return products
+        for url, products in zip(urls, results):
+            logger.info(f"Browser scraper found {len(products)} products on {url}")
+        return results
 
     def scrape_all_sites(self, sync: bool = True, limit: Optional[int] = None) -> bool:
         """
@@ -288,13 +408,38 @@ class FashionScraper:
         Returns:
             True if all sites scraped successfully
         """
-        success = True
+        return asyncio.run(self.scrape_all_sites_async(sync=sync, limit=limit))
+
+    async def scrape_all_sites_async(self, sync: bool = True, limit: Optional[int] = None) -> bool:
+        """
+        Scrape all configured sites concurrently, sharing one browser between them.
+
+        Args:
+            sync: Whether to sync to database
+            limit: Maximum products per site (for testing)
 
-        for site_name in self.config.keys():
-            site_success = self.scrape_site(site_name, sync=sync, limit=limit)
-            if not site_success:
+        Returns:
+            True if all sites scraped successfully
+        """
+        site_names = list(self.config)
+        async with self:
+            # Start the browser before the sites run, so they don't race to launch it
+            if any(self.config[name].get('mode') == 'browser' for name in site_names):
+                await self._ensure_browser()
+
+            results = await asyncio.gather(
+                *(self._scrape_site(name, sync, limit) for name in site_names),
+                return_exceptions=True
+            )
+
+        success = True
+        for site_name, result in zip(site_names, results):
+            if result is not True:
                 success = False
-                logger.error(f"Failed to scrape site: {site_name}")
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to scrape site {site_name}: {result}")
+                else:
+                    logger.error(f"Failed to scrape site: {site_name}")
 
         return success
 
@@ -91,6 +91,252 @@ def test_image_filtering():
         print(f"Image filtering test failed: {e}")
         return False
 
+def test_gender_detection():
+    """Test that gender terms only match as whole words."""
+    print("Testing gender detection...")
+
+    try:
+        from scraper.browser_scraper import BrowserScraper
+
+        scraper = BrowserScraper()
+
+        cases = [
+            ('https://scuffers.com/products/women-zip-hoodie', 'women'),
+            ('https://scuffers.com/products/mens-cargo-pants', 'men'),
+            ('https://scuffers.com/products/female-knit', 'women'),
+            ('https://scuffers.com/products/garment-dyed-tee', None),
+            ('https://scuffers.com/products/basement-cap', None),
+        ]
+
+        all_passed = True
+        for url, expected in cases:
+            result = scraper._match_gender(url.lower())
+            status = "PASS" if result == expected else "FAIL"
+            print(f"  {status}: {url.split('/')[-1]} -> {result}")
+            if result != expected:
+                all_passed = False
+
+        if all_passed:
+            print("Gender detection test PASSED")
+        else:
+            print("Gender detection test FAILED")
+        return all_passed
+
+    except Exception as e:
+        print(f"Gender detection test failed: {e}")
+        return False
+
+def test_json_product_normalization():
+    """Test that products.json items come out like the collection grid's products."""
+    print("Testing products.json normalization...")
+
+    try:
+        from scraper.browser_scraper import BrowserScraper
+        from scraper.database import _format_price_string
+
+        scraper = BrowserScraper()
+        page_url = 'https://scuffers.com/collections/all?page=2'
+        base_url = scraper._site_root(page_url)
+        page_signals = scraper._page_signals({'url': page_url})
+        products_path = scraper._products_path(page_url)
+        image = 'https://scuffers.com/cdn/shop/files/RodBluePants_SEM51_1.jpg?v=1765915763'
+
+        def build(handle, price, compare_at=None):
+            item = {
+                'handle': handle,
+                'title': 'Rod Blue Pants',
+                'images': [{'src': image}],
+                'variants': [{'price': price, 'compare_at_price': compare_at}],
+            }
+            return scraper._build_product_from_json(item, base_url, page_signals, products_path, 'EUR')
+
+        regular = build('rod-blue-pants', '45.00')
+        marked_down = build('rod-blue-pants', '36.00', '45.00')
+        equal_compare_at = build('rod-blue-pants', '45.00', '45.00')
+
+        checks = [
+            ('collection-scoped URL',
+             regular['product_url'] == 'https://scuffers.com/collections/all/products/rod-blue-pants'),
+            ('external_id is the handle', regular['external_id'] == 'rod-blue-pants'),
+            ('price has currency', regular['price'] == '45.00 EUR' and 'sale' not in regular),
+            ('price stored like the grid', _format_price_string(regular['price']) == _format_price_string('45,00 EUR')),
+            ('compare_at is the regular price', marked_down['price'] == '45.00 EUR' and marked_down['sale'] == '36.00 EUR'),
+            ('equal compare_at is no sale', equal_compare_at['price'] == '45.00 EUR' and 'sale' not in equal_compare_at),
+            ('gift card skipped', build('scuffers-gift-card', '50.00') is None and build('giftcard', '50.00') is None),
+            ('bare path outside collections', scraper._products_path('https://scuffers.com/search?q=x') == '/products'),
+        ]
+
+        all_passed = True
+        for name, passed in checks:
+            print(f"  {'PASS' if passed else 'FAIL'}: {name}")
+            all_passed = all_passed and passed
+
+        if all_passed:
+            print("products.json normalization test PASSED")
+        else:
+            print("products.json normalization test FAILED")
+        return all_passed
+
+    except Exception as e:
+        print(f"products.json normalization test failed: {e}")
+        return False
+
+def test_iter_products_early_close():
+    """Test that closing iter_products early stops the scrape without leaking its task."""
+    print("Testing iter_products early close...")
+
+    try:
+        import asyncio
+        from scraper.browser_scraper import BrowserScraper
+
+        scraper = BrowserScraper()
+        finished = []
+
+        async def fake_scrape(url, selectors, max_products, sink=None):
+            # More batches than the queue holds, so the producer is blocked when the consumer stops
+            try:
+                for i in range(10):
+                    await sink([{'product_url': f'{url}/products/p{i}'}])
+            finally:
+                finished.append(url)
+
+        scraper.scrape_all_products = fake_scrape
+
+        async def run():
+            products = scraper.iter_products('https://scuffers.com/collections/all', {})
+            first = await products.__anext__()
+            await asyncio.sleep(0.01)  # Let the producer fill the queue
+            await products.aclose()
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+            # Consuming everything still ends cleanly with the queue full at the end
+            everything = [product async for product in scraper.iter_products('https://scuffers.com/collections/x', {})]
+            return first, pending, everything
+
+        first, pending, everything = asyncio.run(run())
+        checks = [
+            ('first product yielded', first['product_url'].endswith('/p0')),
+            ('scrape stopped before returning', finished[:1] == ['https://scuffers.com/collections/all']),
+            ('no pending tasks', not pending),
+            ('full consumption', len(everything) == 10),
+        ]
+
+        all_passed = True
+        for name, passed in checks:
+            print(f"  {'PASS' if passed else 'FAIL'}: {name}")
+            all_passed = all_passed and passed
+
+        if all_passed:
+            print("iter_products early close test PASSED")
+        else:
+            print("iter_products early close test FAILED")
+        return all_passed
+
+    except Exception as e:
+        print(f"iter_products early close test failed: {e}")
+        return False
+
+def test_next_url_fetch_fallback():
+    """Test that a failed data-next-url fetch mid-collection still collects the later pages."""
+    print("Testing data-next-url fallback...")
+
+    try:
+        import asyncio
+        from scraper.browser_scraper import BrowserScraper
+
+        scraper = BrowserScraper()
+        pages = 6
+        site = 'https://scuffers.com/collections/all'
+
+        def products_on(n):
+            return [{'external_id': f'p{n}-{i}', 'product_url': f'{site}/products/p{n}-{i}'} for i in range(2)]
+
+        class FakeLocator:
+            first = last = property(lambda self: self)
+
+            async def wait_for(self, **kwargs):
+                pass
+
+            async def scroll_into_view_if_needed(self, **kwargs):
+                pass
+
+        class FakePage:
+            # Pages rendered in the live grid; Load More appends the next one
+            def __init__(self):
+                self.url = site
+                self.rendered = [1]
+
+            async def goto(self, url, **kwargs):
+                self.url = url
+                self.rendered = [int(url.split('page=')[1])] if 'page=' in url else [1]
+
+            def on(self, event, handler):
+                pass
+
+            def locator(self, selector):
+                return FakeLocator()
+
+        def page_url(n):
+            return f'?page={n}' if n <= pages else None
+
+        async def next_page_url(page):
+            return page_url(page.rendered[-1] + 1) or ''
+
+        async def extract(page, selectors, offset, limit):
+            containers = [product for n in page.rendered for product in products_on(n)]
+            return containers[offset:], len(containers)
+
+        async def fetch_next(page, selectors, url, limit=None):
+            n = int(url.split('page=')[1])
+            if n == 4:
+                # Clicking from the first page would reload pages 2 and 3, both already read
+                return None
+            return products_on(n), page_url(n + 1)
+
+        async def click(page):
+            if page.rendered[-1] >= pages:
+                return None
+            page.rendered.append(page.rendered[-1] + 1)
+            return 'clicked'
+
+        async def count(page, selector):
+            return 2 * len(page.rendered)
+
+        async def noop(*args, **kwargs):
+            return None
+
+        async def no_responses(queue, url):
+            return []
+
+        scraper._next_page_url = next_page_url
+        scraper._extract_products_from_page = extract
+        scraper._fetch_next_page = fetch_next
+        scraper._click_load_more = click
+        scraper._count_products = count
+        scraper._wait_for_more_products = noop
+        scraper._handle_cookie_consent = noop
+        scraper._drain_collection_responses = no_responses
+
+        collected = []
+
+        async def sink(batch):
+            collected.extend(product['external_id'] for product in batch)
+
+        total = asyncio.run(scraper._scrape_page(FakePage(), site, {}, 1000, sink))
+        expected = [product['external_id'] for n in range(1, pages + 1) for product in products_on(n)]
+
+        passed = total == len(expected) and sorted(collected) == sorted(expected)
+        print(f"  {'PASS' if passed else 'FAIL'}: collected {total}/{len(expected)} products")
+        if passed:
+            print("data-next-url fallback test PASSED")
+        else:
+            print("data-next-url fallback test FAILED")
+        return passed
+
+    except Exception as e:
+        print(f"data-next-url fallback test failed: {e}")
+        return False
+
 def test_database_connection():
     """Test Supabase connection (skipped when SUPABASE_URL/KEY not set)."""
     print("Testing Supabase connection...")
@@ -205,6 +451,45 @@ def test_database_upsert_payload_no_embedding():
         print(f"Database payload test failed: {e}")
         return False
 
+def test_database_delete_forgets_synced_rows():
+    """Test that a deleted product is upserted again when re-scraped unchanged."""
+    print("Testing database delete then re-upsert...")
+
+    try:
+        from unittest.mock import MagicMock
+        from scraper.database import SupabaseDB
+
+        # No connection: the REST session is mocked, so only the skip logic runs
+        db = SupabaseDB.__new__(SupabaseDB)
+        db._synced_rows = {}
+        db.rest_client = MagicMock(base_url='https://db.example.com')
+        db.rest_client.session.post.return_value = MagicMock(status_code=201)
+        db.rest_client.session.delete.return_value = MagicMock(status_code=204)
+
+        product = {
+            'source': 'test',
+            'product_url': 'https://example.com/p/1',
+            'image_url': 'https://example.com/img1.jpg',
+            'title': 'Product 1',
+        }
+        posts = db.rest_client.session.post
+
+        db.upsert_products([product])
+        db.upsert_products([product])  # Unchanged: skipped
+        skipped = posts.call_count == 1
+        deleted = db.delete_products([product]) == 1
+        db.upsert_products([product])  # Deleted, so sent again
+        resent = posts.call_count == 2
+
+        if skipped and deleted and resent:
+            print("Deleted product is upserted again")
+            return True
+        print(f"FAIL: skipped={skipped}, deleted={deleted}, resent={resent}")
+        return False
+    except Exception as e:
+        print(f"Database delete test failed: {e}")
+        return False
+
 def test_database_upsert_live():
     """Test real upsert of 1 product when SUPABASE_URL/KEY are set (validates full import)."""
     print("Testing database upsert (live)...")
@@ -264,8 +549,13 @@ def main():
         ("Configuration", test_config),
         ("Database Connection", test_database_connection),
         ("Database payload no 'embedding'", test_database_upsert_payload_no_embedding),
+        ("Database delete then re-upsert", test_database_delete_forgets_synced_rows),
         ("Database upsert (live)", test_database_upsert_live),
         ("Image Filtering", test_image_filtering),
+        ("Gender Detection", test_gender_detection),
+        ("products.json Normalization", test_json_product_normalization),
+        ("iter_products Early Close", test_iter_products_early_close),
+        ("data-next-url Fallback", test_next_url_fetch_fallback),
         ("HTML Scraper", test_html_scraper),
         ("Embeddings", test_embeddings),
     ]
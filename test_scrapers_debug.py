@@ -3,6 +3,9 @@
 Debug script to inspect Scuffers HTML structure.
 """
 
+import asyncio
+import re
+import sys
 import requests
 from bs4 import BeautifulSoup
 import os
@@ -10,23 +13,29 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def inspect_scuffers_page():
-    """Inspect the actual HTML structure of Scuffers page."""
-    url = "https://scuffers.com/collections/all"
+DEFAULT_URLS = ["https://scuffers.com/collections/all"]
+
+# Decimal prices with an optional EUR suffix, matched in one sweep of the page text
+PRICE_RE = re.compile(r'\d+[.,]\d+(?:\s*EUR)?')
+
+def inspect_scuffers_page(url: str = DEFAULT_URLS[0]) -> str:
+    """Inspect the actual HTML structure of Scuffers page and return the report."""
+    lines = []
+    report = lines.append  # Buffered so concurrent inspections don't interleave
 
     headers = {
         'User-Agent': os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
     }
 
-    print(f"Fetching: {url}")
-    print(f"User-Agent: {headers['User-Agent']}")
+    report(f"Fetching: {url}")
+    report(f"User-Agent: {headers['User-Agent']}")
 
     try:
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
-        print(f"Status: {response.status_code}")
-        print(f"Content length: {len(response.content)}")
+        report(f"Status: {response.status_code}")
+        report(f"Content length: {len(response.content)}")
 
         soup = BeautifulSoup(response.content, 'lxml')
 
@@ -43,59 +52,60 @@ def inspect_scuffers_page():
             '[class*="card"]'
         ]
 
-        print("\n=== Looking for product containers ===")
+        report("\n=== Looking for product containers ===")
         for selector in potential_containers:
             elements = soup.select(selector)
             if elements:
-                print(f"Found {len(elements)} elements with selector '{selector}'")
+                report(f"Found {len(elements)} elements with selector '{selector}'")
                 if len(elements) <= 5:  # Show details for small numbers
                     for i, elem in enumerate(elements[:3]):
-                        print(f"  Element {i+1}: {elem.get('class', 'no-class')} - {elem.get_text(strip=True)[:100]}...")
+                        report(f"  Element {i+1}: {elem.get('class', 'no-class')} - {elem.get_text(strip=True)[:100]}...")
                 break
 
         # Look for product links
-        print("\n=== Looking for product links ===")
+        report("\n=== Looking for product links ===")
         product_links = soup.find_all('a', href=lambda x: x and '/products/' in x)
-        print(f"Found {len(product_links)} links containing '/products/'")
+        report(f"Found {len(product_links)} links containing '/products/'")
 
         for i, link in enumerate(product_links[:5]):
-            print(f"  Link {i+1}: {link.get('href')} - Text: {link.get_text(strip=True)[:50]}")
+            report(f"  Link {i+1}: {link.get('href')} - Text: {link.get_text(strip=True)[:50]}")
 
         # Look for price patterns
-        print("\n=== Looking for price patterns ===")
-        price_patterns = [
-            r'\d+,\d+\s*EUR',
-            r'\d+\.\d+\s*EUR',
-            r'\d+,\d+',
-            r'\d+\.\d+'
-        ]
-
-        text_content = soup.get_text()
-        for pattern in price_patterns:
-            import re
-            matches = re.findall(pattern, text_content)
-            if matches:
-                print(f"Pattern '{pattern}' found {len(matches)} matches: {matches[:5]}")
+        report("\n=== Looking for price patterns ===")
+        matches = PRICE_RE.findall(soup.get_text())
+        if matches:
+            with_currency = sum(1 for match in matches if match.endswith('EUR'))
+            report(f"Pattern '{PRICE_RE.pattern}' found {len(matches)} matches "
+                   f"({with_currency} with EUR): {matches[:5]}")
 
         # Look for specific text patterns we saw in the original HTML
-        print("\n=== Looking for specific Scuffers patterns ===")
+        report("\n=== Looking for specific Scuffers patterns ===")
         specific_texts = ['EUR', 'new in', 'NEW ', '+1']
         for text in specific_texts:
             elements_with_text = soup.find_all(string=lambda x: x and text in x.strip())
-            print(f"Found {len(elements_with_text)} elements containing '{text}'")
+            report(f"Found {len(elements_with_text)} elements containing '{text}'")
 
         # Show a sample of the HTML structure
-        print("\n=== Sample HTML structure ===")
+        report("\n=== Sample HTML structure ===")
         # Find the main content area
         main_content = soup.find('main') or soup.find('[role="main"]') or soup.find('.main') or soup
         if main_content:
-            print("Main content preview:")
-            print(str(main_content)[:1000] + "..." if len(str(main_content)) > 1000 else str(main_content))
+            report("Main content preview:")
+            report(str(main_content)[:1000] + "..." if len(str(main_content)) > 1000 else str(main_content))
 
     except Exception as e:
-        print(f"Error: {e}")
+        report(f"Error: {e}")
         import traceback
-        traceback.print_exc()
+        report(traceback.format_exc())
+
+    return '\n'.join(lines)
+
+async def inspect_pages(urls):
+    """Inspect several pages concurrently and print the reports in URL order."""
+    reports = await asyncio.gather(*(asyncio.to_thread(inspect_scuffers_page, url) for url in urls))
+    for report in reports:
+        print(report)
+        print()
 
 if __name__ == "__main__":
-    inspect_scuffers_page()
+    asyncio.run(inspect_pages(sys.argv[1:] or DEFAULT_URLS))